@@ -1,45 +1,65 @@
 # scripts/bootstrap.py
 
-import csv
+import hashlib
 import sys
 from pathlib import Path
 
 # IMPORTS PARA BD DINÁMICA
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from src.core.services.etl import ETLService
-from src.infrastructure.embeddings.sentence_transformers import (
-    SentenceTransformerEmbedder,
-)
-from src.infrastructure.persistence.faiss.faiss_ import FaissVectorStorage
-from src.infrastructure.persistence.sqlalchemy.base import Base
+from src.infrastructure.persistence.sqlalchemy.base import Base, make_engine
 from src.infrastructure.persistence.sqlalchemy.sql_ import SqlDocumentStorage
 from src.settings import settings
+from src.utils import READ_BUFFER, iter_csv_texts
 
-DELIMITER = ";"
 
+def _print_skipped_row(i: int, row: list[str]) -> None:
+    print(f"[WARN] Row {i} skipped (len={len(row)}): {row}")
 
-def main():
-    # 1) Creamos engine y sesión basados en la URL actualizada
-    engine = create_engine(
-        settings.sqlite_url, connect_args={"check_same_thread": False}
+
+def _csv_digest(csv_path: Path) -> str:
+    """Clave de la caché de vectores: contenido del CSV + modelo + dtype + cabecera."""
+    h = hashlib.sha256()
+    with csv_path.open("rb", buffering=READ_BUFFER) as fh:
+        while block := fh.read(READ_BUFFER):
+            h.update(block)
+    # st_dtype: vectores calculados con otra precisión no se reutilizan
+    h.update(
+        f"|{settings.st_embedding_model}|{settings.st_dtype}"
+        f"|{settings.csv_has_header}".encode()
     )
-    SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
-    Base.metadata.create_all(bind=engine)
+    return h.hexdigest()
 
-    # 2️⃣  ¡muy importante!  -> que todo el proyecto use ESTA sesión
-    from src.infrastructure.persistence.sqlalchemy import base as _db_base
 
-    _db_base.SessionLocal = SessionLocal  # ← sobrescribimos la global
+def make_ingest_embedder(csv_path: Path):
+    """
+    Embedder para la ingesta envuelto en la caché fp16 de `vectors_cache_path`:
+    el modelo sólo se carga si el CSV (o el modelo) cambió desde la última vez.
+    """
+    from src.infrastructure.embeddings import sentence_transformers as st_mod
+    from src.infrastructure.embeddings.vector_cache import Fp16VectorCache
 
-    from src.infrastructure.persistence.sqlalchemy import sql_ as _sql_mod
+    def load():
+        return st_mod.SentenceTransformerEmbedder(
+            model_name=settings.st_embedding_model,
+            batch_size=settings.st_ingest_batch_size,
+        )
+
+    if not settings.vectors_cache_path:
+        return Fp16VectorCache(load, None)
+    return Fp16VectorCache(load, settings.vectors_cache_path, _csv_digest(csv_path))
+
+
+def main():
+    # imports pesados (torch, faiss) dentro de main: build_index reutiliza el
+    # lector CSV de este módulo sin pagarlos
+    from src.core.services.etl import ETLService
+    from src.infrastructure.persistence.faiss.faiss_ import FaissVectorStorage
 
-    # 3️⃣  Que las próximas llamadas a SqlDocumentStorage() sin argumentos
-    #     utilicen ESTA nueva SessionLocal -------------------------------
-    _sql_mod.SessionLocal = SessionLocal  # módulo
-    _sql_mod.SqlDocumentStorage.__init__.__defaults__ = (SessionLocal,)
-    _db_base.engine = engine  # (opcional, por coherencia)
+    # 1) Creamos engine y sesión basados en la URL actualizada
+    engine = make_engine(settings.sqlite_url)
+    SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    Base.metadata.create_all(bind=engine)
 
     # 2) Leemos CSV
     csv_path = Path(settings.faq_csv)
@@ -47,30 +67,27 @@ def main():
         print(f"[ERR] CSV file not found at {csv_path}")
         sys.exit(1)
 
-    texts = []
-    with csv_path.open(encoding="utf-8") as fh:
-        reader = csv.reader(fh, delimiter=DELIMITER)
-        if settings.csv_has_header:
-            next(reader, None)
-        for i, row in enumerate(reader, 1):
-            if len(row) < 2:
-                print(f"[WARN] Row {i} skipped (len={len(row)}): {row}")
-                continue
-            texts.append(f"{row[0].strip()} {row[1].strip()}")
-    if not texts:
-        print("[ERR] No texts found in CSV.")
-        sys.exit(1)
+    print(f"[INFO] Streaming documents from {csv_path}.")
 
-    print(f"[INFO] Parsed {len(texts)} documents from CSV.")
-
-    # 3) Invocamos ETL con nuestro SessionLocal freshly-built
+    # 3) Invocamos ETL inyectando el SessionLocal propio (sin tocar globals)
     doc_repo = SqlDocumentStorage(session_factory=SessionLocal)
+    embedder = make_ingest_embedder(csv_path)
     vector_repo = FaissVectorStorage(
-        index_path=settings.index_path, id_map_path=settings.id_map_path
+        index_path=settings.index_path,
+        id_map_path=settings.id_map_path,
+        dim=embedder.dim,
     )
-    embedder = SentenceTransformerEmbedder(model_name=settings.st_embedding_model)
     etl = ETLService(doc_repo, vector_repo, embedder)
-    ids = etl.ingest(texts)
+    ids = etl.ingest_stream(
+        iter_csv_texts(
+            csv_path, has_header=settings.csv_has_header, on_skip=_print_skipped_row
+        ),
+        settings.ingest_chunk_size,
+    )
+    if not ids:
+        print("[ERR] No texts found in CSV.")
+        sys.exit(1)
+    embedder.save()
 
     print(f"[OK] Ingested {len(ids)} docs into SQL and FAISS.")
 
@@ -8,101 +8,76 @@ It uses a dedicated database engine and session for this process.
 import logging
 from pathlib import Path
 
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
 
-# Importar las funciones del nuevo módulo data_loader
-from src.data_loader import setup_initial_data_from_csv
-
-# Para asegurar la creación de tablas
-from src.infra.persistence.sqlalchemy.models import Base as AppDeclarativeBase
-
-# Importar el embedder que se usará para la indexación si es modo denso
-from src.infrastructure.embeddings import (  # o el que decidas
-    SentenceTransformerEmbedder,
-)
+from scripts.bootstrap import make_ingest_embedder
+from src.infrastructure.persistence.sqlalchemy.base import Base, make_engine
+from src.infrastructure.persistence.sqlalchemy.sql_ import SqlDocumentStorage
 from src.settings import settings
+from src.utils import iter_csv_texts
 
 logger = logging.getLogger(__name__)
-# Configurar el logging para que se vea la salida del script y de data_loader
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 
 
 def main() -> None:
     """
     Main entry point for the build_index script.
-    Initializes DB and optionally FAISS index using functionality from data_loader.
+    Initializes DB and, for dense/hybrid modes, the FAISS index from real embeddings.
     """
+    # Configurar el logging aquí y no al importar: importar el módulo no tiene efectos
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
     logger.info("Starting build_index script...")
 
-    # 1. Crear un engine y SessionLocal exclusivos para este script
-    #    Esto evita interferencias con el engine de la aplicación principal.
+    # 1. Engine y SessionLocal exclusivos para este script (inyectados, sin globals)
     logger.info(f"Using database URL: {settings.sqlite_url}")
-    is_in_memory = (
-        "mode=memory" in settings.sqlite_url or ":memory:" in settings.sqlite_url
-    )
-    pool_kwargs = {"poolclass": StaticPool} if is_in_memory else {}
-    script_engine = create_engine(
-        settings.sqlite_url,
-        connect_args={
-            "check_same_thread": False
-        },  # Necesario para SQLite si se usa en threads
-        **pool_kwargs,
-    )
+    script_engine = make_engine(settings.sqlite_url)
     ScriptSessionLocal = sessionmaker(
         bind=script_engine, autocommit=False, autoflush=False
     )
 
     # 2. Asegurar que el esquema de la BBDD (tablas) existe
-    logger.info(f"Ensuring database schema exists at {script_engine.url}...")
-    try:
-        AppDeclarativeBase.metadata.create_all(bind=script_engine)
-        logger.info("Database schema ensured (tables created if they didn't exist).")
-    except Exception as e:
-        logger.error(f"Failed to ensure database schema: {e}", exc_info=True)
-        return  # Salir si no se pueden crear las tablas
-
-    # 3. Embedder
-    embedder_for_indexing = None
-    if settings.retrieval_mode == "dense":
-        logger.info(
-            "Dense retrieval mode detected. Initializing embedder for indexing."
+    Base.metadata.create_all(bind=script_engine)
+
+    csv_path = Path(settings.faq_csv)
+    if not csv_path.is_file():
+        logger.error(f"Halting script: CSV file not found at {csv_path}")
+        return
+    logger.info(f"Using CSV for build_index: {csv_path}")
+
+    doc_repo = SqlDocumentStorage(session_factory=ScriptSessionLocal)
+    texts = iter_csv_texts(csv_path, has_header=settings.csv_has_header)
+    chunk_size = settings.ingest_chunk_size
+
+    # 3. Índice denso sólo si el modo lo usa: nada de vectores de relleno
+    needs_dense = settings.create_dense_index and settings.retrieval_mode in (
+        "dense",
+        "hybrid",
+    )
+    if needs_dense:
+        # imports pesados (torch, faiss) sólo cuando hay índice denso que construir
+        from src.core.services.etl import ETLService
+        from src.infrastructure.persistence.faiss.faiss_ import FaissVectorStorage
+
+        embedder = make_ingest_embedder(csv_path)
+        vector_repo = FaissVectorStorage(
+            index_path=settings.index_path,
+            id_map_path=settings.id_map_path,
+            dim=embedder.dim,
         )
-        embedder_for_indexing = SentenceTransformerEmbedder(
-            model_name=settings.st_embedding_model
+        ids = ETLService(doc_repo, vector_repo, embedder).ingest_stream(
+            texts, chunk_size
         )
-
-    # 4. Usar una sesión de BBDD para llamar a la lógica de data_loader
-    try:
-        with ScriptSessionLocal() as session:
-            logger.info("Calling data_loader.setup_initial_data_from_csv...")
-            csv_to_use = settings.faq_csv
-            header_setting = settings.csv_has_header
-            should_create_dense_index = (
-                settings.create_dense_index is True
-                and settings.retrieval_mode == "dense"
-            )
-            logger.info(f"Using CSV for build_index: {csv_to_use}")
-            setup_initial_data_from_csv(
-                db_session=session,
-                csv_path_str=Path(csv_to_use),  # PASAR EXPLÍCITAMENTE
-                has_header=header_setting,  # PASAR EXPLÍCITAMENTE
-                create_dense_index_flag=should_create_dense_index,
-                embedder_instance=embedder_for_indexing,
-            )
-        logger.info("build_index script finished successfully.")
-
-    except FileNotFoundError as e:
-        logger.error(f"Halting script: {e}")
-    except ValueError as e:  # Por ejemplo, el mismatch de dimensiones del embedder
-        logger.error(f"Halting script due to value error: {e}", exc_info=True)
-    except Exception as e:
-        logger.error(
-            f"An unexpected error occurred during build_index: {e}", exc_info=True
+        embedder.save()
+    else:
+        logger.info(
+            f"Retrieval mode '{settings.retrieval_mode}': skipping FAISS index."
         )
+        ids = doc_repo.store_documents_stream(texts, chunk_size)
+
+    logger.info(f"build_index script finished successfully ({len(ids)} docs).")
 
 
 if __name__ == "__main__":
@@ -4,16 +4,18 @@
 FastAPI router for the application endpoints.
 """
 
-from typing import List
+import json
+from typing import AsyncIterator, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from src.app.dependencies import get_rag_service
 from src.core.services.rag import RagService
 from src.infrastructure.persistence.sqlalchemy.base import get_db
 from src.infrastructure.persistence.sqlalchemy.crud import get_history
-from src.models import AskRequest, AskResponse, DocumentInDB, HistoryItem, QueryResult
+from src.models import AskRequest, AskResponse, HistoryPage
 
 router = APIRouter()
 
@@ -22,55 +24,98 @@ router = APIRouter()
 
 
 @router.post("/ask", response_model=AskResponse)
-def ask(
+async def ask(
     request: AskRequest, service: RagService = Depends(get_rag_service)
-) -> AskResponse:
-    rag_result = service.ask(question=request.question, top_k=request.k)
-    docs = rag_result["docs"]
-    scores = rag_result["scores"]
-
+) -> dict:
+    """Legacy: respuesta completa en un JSON. Para streaming ver `/ask/stream`."""
+    rag_result = await service.aask(question=request.question, top_k=request.k)
+    # dicts planos: FastAPI valida y serializa contra AskResponse en pydantic-core
+    # (Rust) en una pasada, sin construir QueryResult/DocumentInDB en Python
     sources = [
-        QueryResult(
-            document=DocumentInDB(
-                id=doc.id, content=doc.content
-            ),  # extiende aquí si hay metadata
-            score=score,
-        )
-        for doc, score in zip(docs, scores)
+        {"document": {"id": doc.id, "content": doc.content}, "score": float(score)}
+        for doc, score in zip(rag_result["docs"], rag_result["scores"])
     ]
-    return AskResponse(answer=rag_result["answer"], sources=sources)
+    return {"answer": rag_result["answer"], "sources": sources}
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/ask/stream")
+async def ask_stream(
+    request: AskRequest, service: RagService = Depends(get_rag_service)
+) -> StreamingResponse:
+    """
+    Server-Sent Events: primero `sources` (ids y scores), luego un `token` por
+    fragmento del LLM y `done` al final (o `error` si el LLM falla a mitad).
+    """
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for kind, payload in service.astream(request.question, request.k):
+                if kind == "sources":
+                    docs, scores = payload
+                    yield _sse(
+                        "sources",
+                        [{"id": d.id, "score": s} for d, s in zip(docs, scores)],
+                    )
+                else:
+                    yield _sse("token", payload)
+        except HTTPException as err:
+            # las cabeceras ya se enviaron: el error viaja como evento
+            yield _sse("error", {"status": err.status_code, "detail": err.detail})
+            return
+        yield _sse("done", {})
 
+    return StreamingResponse(events(), media_type="text/event-stream")
 
-@router.get("/history", response_model=List[HistoryItem])
+
+@router.get("/history", response_model=HistoryPage)
 def history(
     limit: int = Query(
         10, ge=1, le=100, description="Max number of history items to retrieve"
     ),
+    cursor: Optional[int] = Query(
+        None, description="`next_cursor` of the previous page (keyset pagination)"
+    ),
     offset: int = Query(
-        0, ge=0, description="Number of items to skip (useful for pagination)"
+        0,
+        ge=0,
+        description="Deprecated: use `cursor`. Number of items to skip",
+        deprecated=True,
     ),
     db: Session = Depends(get_db),
-) -> List[HistoryItem]:
+) -> dict:
     """
-    Retrieves historical Q&A pairs from the database.
+    Retrieves historical Q&A pairs from the database, newest first.
 
     Args:
         limit (int): Maximum number of history records to return.
-        offset (int): Number of records to skip.
+        cursor (int | None): Return records older than this id.
+        offset (int): Deprecated offset pagination (ignored when `cursor` is set).
         db (Session): Database session dependency.
 
     Returns:
-        List[HistoryItem]: List of historical Q&A entries.
+        HistoryPage: Entries, whether more exist, and the cursor of the next page.
     """
-    history_entries = get_history(db=db, limit=limit, offset=offset)
-
-    return [
-        HistoryItem(
-            id=entry.id,
-            question=entry.question,
-            answer=entry.answer,
-            created_at=entry.created_at.isoformat(),
-            source_ids=entry.source_ids or [],
-        )
-        for entry in history_entries
+    # limit+1 filas: la extra sólo dice si hay más páginas (sin COUNT aparte)
+    history_entries = get_history(
+        db=db, limit=limit + 1, offset=offset, before_id=cursor
+    )
+    has_more = len(history_entries) > limit
+
+    # dicts planos: una única validación/serialización contra HistoryPage en
+    # pydantic-core, en vez de un HistoryItem construido en Python por fila
+    items = [
+        {
+            "id": entry.id,
+            "question": entry.question,
+            "answer": entry.answer,
+            "created_at": entry.created_at.isoformat(),
+            "source_ids": entry.source_ids or [],
+        }
+        for entry in history_entries[:limit]
     ]
+    next_cursor = items[-1]["id"] if has_more else None
+    return {"items": items, "next_cursor": next_cursor, "has_more": has_more}
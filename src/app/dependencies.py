@@ -1 +1,20 @@
 # src/app/dependencies.py
+
+"""
+Punto de inyección de FastAPI (`Depends(get_rag_service)`). Único origen del
+singleton: todo sale de `src.app.factory`, así router, main y tests comparten
+la misma instancia (y el mismo modelo/índice cargados).
+"""
+
+from src.app import factory
+from src.app.factory import aclose_rag_service
+from src.core.services.rag import RagService
+
+__all__ = ["aclose_rag_service", "get_rag_service"]
+
+
+def get_rag_service() -> RagService:
+    # sin parámetros a propósito: FastAPI convertiría `force_reload` en un query
+    # param público (?force_reload=true reconstruiría retriever y sondeos por
+    # petición). Recargar/resetear sigue siendo interno: factory.reset_rag_service
+    return factory.get_rag_service()
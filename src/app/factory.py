@@ -1,4 +1,4 @@
-# src/app/factories.py
+# src/app/factory.py
 
 """
 Singleton lifecycle for RagService:
@@ -8,12 +8,24 @@ Singleton lifecycle for RagService:
 - For multiprocess (e.g., uvicorn workers>1), each process holds its own singleton.
 """
 
+import hashlib
 import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from pathlib import Path
 
+import httpx
+import numpy as np
+
+from src.core.ports import EmbedderPort
 from src.core.services.rag import RagService
-from src.infrastructure.embeddings.sentence_transformers import (
-    SentenceTransformerEmbedder,
-)
+from src.infrastructure.cache.semantic_answers import SemanticAnswerCache
+from src.infrastructure.embeddings.cached import CachingEmbedder, DiskCachingEmbedder
+from src.infrastructure.llms.cached import CachingGenerator
 from src.infrastructure.llms.ollama_chat import OllamaGenerator
 from src.infrastructure.llms.openai_chat import OpenAIGenerator
 from src.infrastructure.persistence.faiss.index import FaissIndex
@@ -25,69 +37,209 @@ from src.infrastructure.retrieval.dense_faiss import DenseFaissRetriever
 from src.infrastructure.retrieval.hybrid import HybridRetriever
 from src.infrastructure.retrieval.sparse_bm25 import SparseBM25Retriever
 from src.settings import settings
-from src.utils import get_corpus_and_ids
+from src.utils import file_lock, get_corpus_and_ids, iter_csv_texts
 
 logger = logging.getLogger(__name__)
 
 
 def check_faiss_sql_consistency(doc_ids, faiss_index):
-    # validación exhaustiva - puede ser costoso si la base de datos crece mucho
-    sql_set = set(doc_ids)
-    faiss_set = set(faiss_index.id_map)
-    if sql_set != faiss_set:
+    # validación exhaustiva - diferencias de conjuntos en NumPy (int64 contiguo),
+    # sin boxear cada id en un set de Python; el id_map se lee una sola vez
+    faiss_ids = np.asarray(faiss_index.id_map, dtype=np.int64)
+    sql_ids = np.asarray(doc_ids, dtype=np.int64)
+    only_sql = np.setdiff1d(sql_ids, faiss_ids)
+    only_faiss = np.setdiff1d(faiss_ids, sql_ids)
+    if only_sql.size or only_faiss.size:
         logger.warning(
-            f"FAISS/SQL id mismatch. SQL: {sql_set - faiss_set}, FAISS: {faiss_set - sql_set}."
+            "FAISS/SQL id mismatch. SQL: %s, FAISS: %s.",
+            set(only_sql.tolist()),
+            set(only_faiss.tolist()),
         )
-    if len(doc_ids) != len(faiss_index.id_map):
+    if len(sql_ids) != len(faiss_ids):
         logger.warning(
-            f"FAISS id_map ({len(faiss_index.id_map)}) and SQL docs ({len(doc_ids)}) count mismatch. Possible index desync."
+            "FAISS id_map (%d) and SQL docs (%d) count mismatch. Possible index desync.",
+            len(faiss_ids),
+            len(sql_ids),
         )
 
 
+@lru_cache(maxsize=1)
+def _http_client() -> httpx.Client:
+    """Cliente keep-alive para los health-checks: sin handshake TCP por sondeo."""
+    return httpx.Client(
+        timeout=2.0,
+        limits=httpx.Limits(max_keepalive_connections=10, keepalive_expiry=30),
+    )
+
+
+_health: dict[str, tuple[float, bool]] = {}  # url -> (instante, ok) del último sondeo
+
+
+def _probe(url: str, headers: dict | None = None) -> bool:
+    """GET `url` una sola vez cada `ollama_health_ttl` segundos."""
+    now = time.monotonic()
+    cached = _health.get(url)
+    if cached is not None and now - cached[0] < settings.ollama_health_ttl:
+        return cached[1]
+    try:
+        ok = _http_client().get(url, headers=headers).is_success
+    except httpx.HTTPError:
+        ok = False
+    _health[url] = (now, ok)
+    return ok
+
+
+def _probe_ollama() -> bool:
+    return _probe(f"{settings.ollama_base_url.rstrip('/')}/api/tags")
+
+
+def _probe_openai() -> bool:
+    return _probe(
+        f"{settings.openai_base_url.rstrip('/')}/models",
+        headers={"Authorization": f"Bearer {settings.openai_api_key}"},
+    )
+
+
+def _probe_backends() -> tuple[bool, bool]:
+    """(ollama_ok, openai_ok) sondeados en paralelo: la espera es max(timeout), no la suma."""
+    if not settings.openai_api_key:
+        return _probe_ollama(), False
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        ollama, openai = pool.submit(_probe_ollama), pool.submit(_probe_openai)
+        return ollama.result(), openai.result()
+
+
 def get_generator():
     if settings.ollama_enabled:
-        logger.info(f"Using OllamaGenerator (model: {settings.ollama_model})")
+        ollama_ok, openai_ok = _probe_backends()
+        if not ollama_ok:
+            if openai_ok:
+                logger.warning("Ollama not reachable; falling back to OpenAIGenerator")
+                return OpenAIGenerator()
+            logger.warning("Ollama not reachable at %s", settings.ollama_base_url)
+        logger.info("Using OllamaGenerator (model: %s)", settings.ollama_model)
         return OllamaGenerator()
     elif settings.openai_api_key:
-        logger.info(f"Using OpenAIGenerator (model: {settings.openai_model})")
+        logger.info("Using OpenAIGenerator (model: %s)", settings.openai_model)
         return OpenAIGenerator()
     else:
         logger.error("No LLM generator configured")
         raise RuntimeError("No LLM generator configured")
 
 
+# Modelo ST (~400MB) e índice FAISS se cargan una vez por proceso: recrear el
+# retriever (reset_rag_service, tests) no vuelve a leerlos de disco.
+_load_lock = threading.Lock()
+
+
+@lru_cache(maxsize=2)
+def _cached_embedder(model_name: str) -> EmbedderPort:
+    # import diferido: en modo sparse ni torch ni sentence-transformers se cargan
+    from src.infrastructure.embeddings import sentence_transformers as st_mod
+
+    embedder: EmbedderPort = st_mod.SentenceTransformerEmbedder(model_name=model_name)
+    if settings.embed_cache_path:
+        # persistente: los aciertos sobreviven a reinicios del proceso
+        embedder = DiskCachingEmbedder(
+            embedder,
+            settings.embed_cache_path,
+            model_name=model_name,
+            max_entries=settings.embed_cache_max_entries,
+        )
+    if settings.query_embedding_cache_size > 0:
+        # preguntas repetidas: vector del LRU, sin forward del modelo
+        return CachingEmbedder(embedder, maxsize=settings.query_embedding_cache_size)
+    return embedder
+
+
+@lru_cache(maxsize=4)
+def _cached_faiss_index(
+    index_path: str, id_map_path: str, dim: int, mtime_ns: int
+) -> FaissIndex:
+    # mtime en la clave: si bootstrap reescribe el índice, se recarga
+    return FaissIndex(
+        index_path=index_path,
+        id_map_path=id_map_path,
+        dim=dim,
+        mmap=settings.faiss_mmap,
+    )
+
+
+def _dense_retriever(doc_repo, doc_ids) -> DenseFaissRetriever:
+    index_file = Path(settings.index_path)
+    mtime_ns = index_file.stat().st_mtime_ns if index_file.exists() else -1
+    with _load_lock:
+        embedder = _cached_embedder(settings.st_embedding_model)
+        faiss_index = _cached_faiss_index(
+            settings.index_path, settings.id_map_path, embedder.dim, mtime_ns
+        )
+    check_faiss_sql_consistency(doc_ids, faiss_index)
+    return DenseFaissRetriever(
+        embedder=embedder,
+        faiss_index=faiss_index,
+        doc_repo=doc_repo,
+        batch_window_ms=settings.query_batch_window_ms,
+        batch_max_size=settings.query_batch_max_size,
+    )
+
+
+def _seed_lock():
+    """Lock de fichero entre procesos (workers de uvicorn) para sembrar la BD."""
+    key = hashlib.sha1(settings.sqlite_url.encode()).hexdigest()[:12]
+    return file_lock(Path(tempfile.gettempdir()) / f"rag-seed-{key}.lock")
+
+
+def _load_corpus(doc_repo):
+    """
+    Corpus e ids de BD (en modo denso sólo ids). Sólo en modo sparse, con la BD
+    vacía y `auto_populate_db_on_startup`, siembra desde el CSV y reutiliza esos
+    textos + los ids devueltos por el INSERT: sin un segundo SELECT de la tabla.
+    Dense/hybrid no siembran: las filas quedarían sin vector en FAISS
+    (scripts/build_index.py carga BD e índice juntos).
+    """
+    if settings.retrieval_mode == "dense":
+        # sin texto: el corpus sólo lo usa BM25, FAISS resuelve por id
+        return [], list(doc_repo.get_all_ids())
+    csv_path = Path(settings.faq_csv)
+    seed = (
+        settings.retrieval_mode == "sparse"
+        and settings.auto_populate_db_on_startup
+        and csv_path.is_file()
+    )
+    # lectura y siembra bajo el mismo lock: con N workers sólo el primero
+    # inserta, los demás ya encuentran la tabla llena
+    with _seed_lock() if seed else nullcontext():
+        corpus, doc_ids = get_corpus_and_ids(doc_repo)
+        if doc_ids or not seed:
+            return corpus, doc_ids
+        logger.info("Empty document table: seeding from %s", csv_path)
+        corpus = list(iter_csv_texts(csv_path, has_header=settings.csv_has_header))
+        doc_ids = list(
+            doc_repo.store_documents_stream(corpus, settings.ingest_chunk_size)
+        )
+    return corpus, doc_ids
+
+
 def get_retriever():
     doc_repo = SqlDocumentStorage()
-    corpus, doc_ids = get_corpus_and_ids(doc_repo)
+    corpus, doc_ids = _load_corpus(doc_repo)
 
     if settings.retrieval_mode == "dense":
-        embedder = SentenceTransformerEmbedder(model_name=settings.st_embedding_model)
-        faiss_index = FaissIndex(
-            index_path=settings.index_path,
-            id_map_path=settings.id_map_path,
-            dim=embedder.dim,
-        )
-        check_faiss_sql_consistency(doc_ids, faiss_index)
         logger.info(f"Using DenseFaissRetriever (docs: {len(doc_ids)})")
-        return DenseFaissRetriever(
-            embedder=embedder, faiss_index=faiss_index, doc_repo=doc_repo
-        )
+        return _dense_retriever(doc_repo, doc_ids)
     elif settings.retrieval_mode == "sparse":
         logger.info(f"Using SparseBM25Retriever (docs: {len(doc_ids)})")
-        return SparseBM25Retriever(documents=corpus, doc_ids=doc_ids, doc_repo=doc_repo)
-    elif settings.retrieval_mode == "hybrid":
-        embedder = SentenceTransformerEmbedder(model_name=settings.st_embedding_model)
-        faiss_index = FaissIndex(
-            index_path=settings.index_path,
-            id_map_path=settings.id_map_path,
-            dim=embedder.dim,
-        )
-        check_faiss_sql_consistency(doc_ids, faiss_index)
-        dense = DenseFaissRetriever(
-            embedder=embedder, faiss_index=faiss_index, doc_repo=doc_repo
+        return SparseBM25Retriever(
+            documents=corpus,
+            doc_ids=doc_ids,
+            cache_path=settings.bm25_cache_path,
         )
+    elif settings.retrieval_mode == "hybrid":
+        dense = _dense_retriever(doc_repo, doc_ids)
         sparse = SparseBM25Retriever(
-            documents=corpus, doc_ids=doc_ids, doc_repo=doc_repo
+            documents=corpus,
+            doc_ids=doc_ids,
+            cache_path=settings.bm25_cache_path,
         )
         logger.info(f"Using HybridRetriever (dense+bm25) (docs: {len(doc_ids)})")
         return HybridRetriever(dense=dense, sparse=sparse, alpha=0.5)
@@ -96,17 +248,59 @@ def get_retriever():
         raise ValueError(f"Unsupported retrieval_mode: {settings.retrieval_mode}")
 
 
+def _answer_cache() -> SemanticAnswerCache | None:
+    if settings.answer_cache_size <= 0:
+        return None
+    # mismo embedder (cacheado) que el modo denso: el modelo no se carga dos veces
+    with _load_lock:
+        embedder = _cached_embedder(settings.st_embedding_model)
+    return SemanticAnswerCache(
+        embedder,
+        threshold=settings.answer_cache_threshold,
+        maxsize=settings.answer_cache_size,
+    )
+
+
 _rag_service = None
+# peticiones concurrentes en frío: un único hilo construye el servicio
+_init_lock = threading.Lock()
 
 
 def get_rag_service(force_reload: bool = False) -> RagService:
     global _rag_service
-    if force_reload or _rag_service is None:
-        retriever = get_retriever()
-        generator = get_generator()
-        history_storage = HistorySqlStorage()
-        _rag_service = RagService(retriever, generator, history_storage)
-    return _rag_service
+    service = _rag_service
+    if service is not None and not force_reload:
+        return service
+    with _init_lock:
+        if force_reload or _rag_service is None:
+            if force_reload:
+                _health.clear()  # recarga forzada: los backends se vuelven a sondear
+            retriever = get_retriever()
+            generator = get_generator()
+            if settings.generation_cache_size > 0:
+                # misma pregunta + mismos contextos: respuesta sin llamar al LLM
+                generator = CachingGenerator(
+                    generator, maxsize=settings.generation_cache_size
+                )
+            history_storage = HistorySqlStorage()
+            _rag_service = RagService(
+                retriever, generator, history_storage, answer_cache=_answer_cache()
+            )
+        return _rag_service
+
+
+async def aclose_rag_service() -> None:
+    """
+    Shutdown del lifespan: cierra los clientes async del generador y el worker
+    de micro-batching del retriever del singleton, si existe.
+    """
+    service = _rag_service
+    if service is None:
+        return
+    for part in (service.generator, service.retriever):
+        aclose = getattr(part, "aclose", None)
+        if aclose is not None:
+            await aclose()
 
 
 def reset_rag_service():
@@ -114,4 +308,6 @@ def reset_rag_service():
     Reset the singleton RAG service (for tests, dev, or controlled reload).
     """
     global _rag_service
-    _rag_service = None
+    with _init_lock:
+        _rag_service = None
+        _health.clear()
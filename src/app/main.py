@@ -1,4 +1,5 @@
 # src/app/main.py
+import asyncio
 import logging
 import sys
 from contextlib import asynccontextmanager
@@ -9,7 +10,7 @@ from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 
 from src.app.api_router import router
-from src.app.dependencies import get_rag_service
+from src.app.dependencies import aclose_rag_service, get_rag_service
 from src.infrastructure.persistence.sqlalchemy.base import Base as AppDeclarativeBase
 from src.infrastructure.persistence.sqlalchemy.base import engine as global_app_engine
 from src.settings import settings
@@ -29,11 +30,28 @@ async def lifespan(app_instance: FastAPI):
     AppDeclarativeBase.metadata.create_all(bind=global_app_engine)
     logger.info("Lifespan startup: Database tables checked/created.")
 
-    logger.info("Lifespan startup: Initializing RAG service...")
-    get_rag_service()
-    logger.info("Lifespan startup: RAG service initialized.")
+    # index.html se lee una vez: GET / sirve los bytes sin open/read/decode
+    index_html_path = FRONTEND_DIR / "index.html"
+    if index_html_path.is_file():
+        app_instance.state.index_html = index_html_path.read_bytes()
+
+    if settings.warmup_on_startup:
+        logger.info("Lifespan startup: Initializing RAG service...")
+        # en un hilo: cargar modelo/índice y sondear LLMs no bloquea el event loop
+        service = await asyncio.to_thread(get_rag_service)
+        logger.info("Lifespan startup: RAG service initialized.")
+        warm = getattr(service.retriever, "warm", None)
+        if warm is not None:
+            # el primer /ask no paga fallos de página del índice ni el primer forward
+            await asyncio.to_thread(warm)
+            logger.info("Lifespan startup: retriever warmed up.")
+    else:
+        # perezoso: `/` y `/history` no cargan embedder, FAISS ni cliente LLM;
+        # el primer /ask construye el servicio (Depends + lock en factory)
+        logger.info("Lifespan startup: RAG service deferred to first request.")
     yield
     logger.info("Lifespan shutdown: Cleaning up resources (if any)...")
+    await aclose_rag_service()
 
 
 app = FastAPI(title="Local RAG Demo", lifespan=lifespan)
@@ -50,6 +68,11 @@ FRONTEND_DIR = PROJECT_ROOT_DIR / "frontend"
 
 @app.get("/", response_class=HTMLResponse)
 async def serve_frontend_route(request: Request):
+    cached = getattr(request.app.state, "index_html", None)
+    if cached is not None:
+        return HTMLResponse(content=cached, status_code=200)
+
+    # sin caché (lifespan no ejecutado o fichero ausente al arrancar): disco
     index_html_path = FRONTEND_DIR / "index.html"
     if not index_html_path.is_file():
         logger.error(f"Frontend file not found at {index_html_path}")
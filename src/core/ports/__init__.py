@@ -1,42 +1,47 @@
 from __future__ import annotations
 
-from typing import Protocol, Sequence, Tuple, runtime_checkable
+from typing import Any, Mapping, Protocol, Sequence, Tuple
 
-from src.core.domain.entities import Document, Embedding
+import numpy as np
+
+from src.core.domain.entities import Document
 
 
 # -------- Ports --------
-@runtime_checkable
 class EmbedderPort(Protocol):
     dim: int
 
-    def embed(self, texts: Sequence[str]) -> Sequence[Embedding]: ...
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Matriz (len(texts), dim) float32, una fila por texto."""
+        ...
 
 
-@runtime_checkable
 class GeneratorPort(Protocol):
+    # opcionales (RagService los detecta con getattr): `async agenerate(question,
+    # contexts)` y `astream(question, contexts)`; sin ellos, generate en un hilo
     def generate(self, question: str, contexts: Sequence[str]) -> str: ...
 
 
-@runtime_checkable
 class RetrieverPort(Protocol):
     def retrieve(
         self, query: str, k: int = 5
     ) -> Tuple[Sequence[Document], Sequence[float]]: ...
 
 
-@runtime_checkable
 class DocumentRepoPort(Protocol):
     def save(self, contents: Sequence[str]) -> Sequence[int]: ...
     def get(self, ids: Sequence[int]) -> Sequence[Document]: ...
 
 
-@runtime_checkable
 class VectorRepoPort(Protocol):
-    def upsert(self, ids: Sequence[int], vectors: Sequence[Embedding]) -> None: ...
-    def similar(self, vector: Embedding, k: int) -> Sequence[tuple[int, float]]: ...
+    def upsert(self, ids: Sequence[int], vectors: np.ndarray) -> None: ...
+    def similar(self, vector: np.ndarray, k: int) -> Sequence[tuple[int, float]]: ...
 
 
-@runtime_checkable
 class QAHistoryPort(Protocol):
     def save(self, q: str, a: str, source_ids: Sequence[int]) -> None: ...
+
+
+class AnswerCachePort(Protocol):
+    def lookup(self, question: str, top_k: int) -> Mapping[str, Any] | None: ...
+    def store(self, question: str, top_k: int, result: Mapping[str, Any]) -> None: ...
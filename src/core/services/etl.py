@@ -1,7 +1,8 @@
-# src/core/etl.py
+# src/core/services/etl.py
 from __future__ import annotations
 
-from typing import Sequence
+from itertools import islice
+from typing import Iterable, Iterator, Sequence
 
 from src.core.ports import DocumentRepoPort, EmbedderPort, VectorRepoPort
 
@@ -24,12 +25,37 @@ class ETLService:
         self._vec_store = vec_storage
         self._embedder = embedder
 
-    def ingest(self, texts: Sequence[str]) -> Sequence[int]:
+    def ingest(self, texts: Sequence[str], **upsert_kwargs) -> Sequence[int]:
         # 1) SQL
         ids = self._doc_store.store_documents(texts)
 
         # 2) Embeddings y vector store
         embeddings = self._embedder.embed(texts)
-        self._vec_store.upsert(ids, embeddings)
+        self._vec_store.upsert(ids, embeddings, **upsert_kwargs)
 
         return ids
+
+    def ingest_stream(self, texts: Iterable[str], chunk_size: int = 1024) -> list[int]:
+        """
+        Ingesta por trozos de `chunk_size` textos: la memoria pico es O(chunk)
+        y la lectura del origen se intercala con el cálculo de embeddings.
+        """
+        # vector store con flush(): los lotes sólo se añaden y el fichero se
+        # graba una vez al final (también si falla a mitad: igual que la BD,
+        # que ya confirmó los lotes previos)
+        flush = getattr(self._vec_store, "flush", None)
+        upsert_kwargs = {"flush": False} if flush is not None else {}
+        ids: list[int] = []
+        try:
+            for chunk in _chunked(texts, chunk_size):
+                ids.extend(self.ingest(chunk, **upsert_kwargs))
+        finally:
+            if flush is not None:
+                flush()
+        return ids
+
+
+def _chunked(items: Iterable[str], size: int) -> Iterator[list[str]]:
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
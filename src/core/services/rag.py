@@ -1,26 +1,207 @@
-# src/core/rag.py
+# src/core/services/rag.py
 
-from typing import Any, Mapping
+import asyncio
+from typing import Any, AsyncIterator, List, Mapping, Sequence, Tuple
 
-from src.core.ports import GeneratorPort, QAHistoryPort, RetrieverPort
+from src.core.ports import AnswerCachePort, GeneratorPort, QAHistoryPort, RetrieverPort
 
 
 class RagService:
     def __init__(
-        self, retriever: RetrieverPort, generator: GeneratorPort, history: QAHistoryPort
+        self,
+        retriever: RetrieverPort,
+        generator: GeneratorPort,
+        history: QAHistoryPort,
+        answer_cache: AnswerCachePort | None = None,
     ):
         self.retriever = retriever
         self.generator = generator
         self.history = history
+        # opcional: preguntas casi idénticas reutilizan la respuesta (sin LLM)
+        self.answer_cache = answer_cache
 
     def ask(self, question: str, top_k: int = 3) -> Mapping[str, Any]:
+        if self.answer_cache is not None:
+            cached = self.answer_cache.lookup(question, top_k)
+            if cached is not None:
+                return self._from_cache(question, cached)
         docs, scores = self.retriever.retrieve(question, top_k)
         if not docs:
-            return {
-                "answer": "No hay documentos indexados. Por favor, ejecuta la ingestión.",
-                "docs": [],
-                "scores": [],
-            }
+            return _no_docs_response()
         answer = self.generator.generate(question, [d.content for d in docs])
         self.history.save(question, answer, [d.id for d in docs])
-        return {"answer": answer, "docs": docs, "scores": scores}
+        return self._remember(
+            question, top_k, {"answer": answer, "docs": docs, "scores": scores}
+        )
+
+    def _from_cache(self, question: str, cached: Mapping[str, Any]):
+        self.history.save(question, cached["answer"], [d.id for d in cached["docs"]])
+        return cached
+
+    def _record(self, question: str, top_k: int, result: Mapping[str, Any]):
+        # historial + caché en un único salto a hilo desde las rutas async
+        self.history.save(question, result["answer"], [d.id for d in result["docs"]])
+        return self._remember(question, top_k, result)
+
+    def _remember(self, question: str, top_k: int, result: Mapping[str, Any]):
+        if self.answer_cache is not None:
+            self.answer_cache.store(question, top_k, result)
+        return result
+
+    def ask_batch(
+        self, questions: Sequence[str], top_k: int = 3
+    ) -> List[Mapping[str, Any]]:
+        """Varias preguntas con un único retrieve_batch si el retriever lo ofrece."""
+        questions = list(questions)
+        results = self._lookup_batch(questions, top_k)
+        misses = [q for q, r in zip(questions, results) if r is None]
+        retrieve_batch = getattr(self.retriever, "retrieve_batch", None)
+        if not misses:
+            hits = []
+        elif retrieve_batch is not None:
+            hits = retrieve_batch(misses, top_k)
+        else:
+            hits = [self.retriever.retrieve(q, top_k) for q in misses]
+        fresh = [
+            (
+                {
+                    "answer": self.generator.generate(q, [d.content for d in docs]),
+                    "docs": docs,
+                    "scores": scores,
+                }
+                if docs
+                else _no_docs_response()
+            )
+            for q, (docs, scores) in zip(misses, hits)
+        ]
+        return self._record_batch(questions, top_k, results, fresh)
+
+    def _lookup_batch(self, questions: List[str], top_k: int) -> list:
+        """Aciertos de la caché de respuestas (None = hay que generar), como `ask`."""
+        if self.answer_cache is None:
+            return [None] * len(questions)
+        results = []
+        for question in questions:
+            cached = self.answer_cache.lookup(question, top_k)
+            results.append(
+                None if cached is None else self._from_cache(question, cached)
+            )
+        return results
+
+    def _record_batch(self, questions, top_k, results, fresh) -> list:
+        """Rellena los huecos con `fresh` pasando cada respuesta por `_record`."""
+        fresh = iter(fresh)
+        for i, (question, result) in enumerate(zip(questions, results)):
+            if result is None:
+                result = next(fresh)
+                results[i] = (
+                    self._record(question, top_k, result) if result["docs"] else result
+                )
+        return results
+
+    async def aask(self, question: str, top_k: int = 3) -> Mapping[str, Any]:
+        """
+        Igual que `ask` sin bloquear el event loop: usa `aretrieve`/`agenerate` si
+        el adapter los ofrece y, si no, ejecuta la versión síncrona en un hilo.
+        """
+        if self.answer_cache is not None:
+            cached = await asyncio.to_thread(self.answer_cache.lookup, question, top_k)
+            if cached is not None:
+                return await asyncio.to_thread(self._from_cache, question, cached)
+        docs, scores = await self._aretrieve(question, top_k)
+        if not docs:
+            return _no_docs_response()
+        answer = await self._agenerate(question, [d.content for d in docs])
+        result = {"answer": answer, "docs": docs, "scores": scores}
+        return await asyncio.to_thread(self._record, question, top_k, result)
+
+    async def aask_batch(
+        self, questions: Sequence[str], top_k: int = 3
+    ) -> List[Mapping[str, Any]]:
+        """
+        `ask_batch` sin bloquear el event loop: un retrieve_batch y las N
+        generaciones a la vez (asyncio.gather), no una detrás de otra.
+        """
+        questions = list(questions)
+        # caché, retrieve, generación e historial: un salto a hilo por fase
+        results = await asyncio.to_thread(self._lookup_batch, questions, top_k)
+        misses = [q for q, r in zip(questions, results) if r is None]
+        retrieve_batch = getattr(self.retriever, "retrieve_batch", None)
+        if not misses:
+            hits = []
+        elif retrieve_batch is not None:
+            hits = await asyncio.to_thread(retrieve_batch, misses, top_k)
+        else:
+            hits = await asyncio.gather(*(self._aretrieve(q, top_k) for q in misses))
+        pending = [(q, docs) for q, (docs, _) in zip(misses, hits) if docs]
+        answers = iter(
+            await asyncio.gather(
+                *(self._agenerate(q, [d.content for d in docs]) for q, docs in pending)
+            )
+        )
+        fresh = [
+            (
+                {"answer": next(answers), "docs": docs, "scores": scores}
+                if docs
+                else _no_docs_response()
+            )
+            for docs, scores in hits
+        ]
+        return await asyncio.to_thread(
+            self._record_batch, questions, top_k, results, fresh
+        )
+
+    async def _agenerate(self, question: str, contexts: List[str]) -> str:
+        agenerate = getattr(self.generator, "agenerate", None)
+        if agenerate is not None:
+            return await agenerate(question, contexts)
+        return await asyncio.to_thread(self.generator.generate, question, contexts)
+
+    async def astream(
+        self, question: str, top_k: int = 3
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Eventos `("sources", (docs, scores))` y luego `("token", str)` por fragmento.
+        El historial se guarda con la respuesta completa al terminar el stream.
+        """
+        if self.answer_cache is not None:
+            cached = await asyncio.to_thread(self.answer_cache.lookup, question, top_k)
+            if cached is not None:
+                await asyncio.to_thread(self._from_cache, question, cached)
+                yield "sources", (cached["docs"], cached["scores"])
+                yield "token", cached["answer"]
+                return
+        docs, scores = await self._aretrieve(question, top_k)
+        yield "sources", (docs, scores)
+        if not docs:
+            yield "token", _no_docs_response()["answer"]
+            return
+        contexts = [d.content for d in docs]
+        parts = []
+        astream = getattr(self.generator, "astream", None)
+        if astream is not None:
+            async for part in astream(question, contexts):
+                parts.append(part)
+                yield "token", part
+        else:
+            # generador sin streaming: un único fragmento con la respuesta entera
+            parts.append(
+                await asyncio.to_thread(self.generator.generate, question, contexts)
+            )
+            yield "token", parts[0]
+        result = {"answer": "".join(parts), "docs": docs, "scores": scores}
+        await asyncio.to_thread(self._record, question, top_k, result)
+
+    async def _aretrieve(self, question: str, top_k: int):
+        aretrieve = getattr(self.retriever, "aretrieve", None)
+        if aretrieve is not None:
+            return await aretrieve(question, top_k)
+        return await asyncio.to_thread(self.retriever.retrieve, question, top_k)
+
+
+def _no_docs_response() -> Mapping[str, Any]:
+    return {
+        "answer": "No hay documentos indexados. Por favor, ejecuta la ingestión.",
+        "docs": [],
+        "scores": [],
+    }
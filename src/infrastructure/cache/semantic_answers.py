@@ -0,0 +1,57 @@
+# src/infrastructure/cache/semantic_answers.py
+
+"""
+Caché semántica de respuestas: una pregunta cuyo embedding tiene coseno >=
+`threshold` con una ya respondida (mismo top_k) devuelve esa respuesta sin
+recuperar ni llamar al LLM. Acotada a `maxsize` entradas, desalojo LRU.
+"""
+
+import threading
+from typing import Any, Mapping
+
+import numpy as np
+
+from src.core.ports import EmbedderPort
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self, embedder: EmbedderPort, threshold: float = 0.95, maxsize: int = 1024
+    ):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.maxsize = maxsize
+        # matriz fija de vectores normalizados: la búsqueda es un único matvec
+        self._vectors = np.zeros((maxsize, embedder.dim), dtype=np.float32)
+        self._ks = np.full(maxsize, -1, dtype=np.int64)  # -1 = hueco libre
+        self._last_used = np.zeros(maxsize, dtype=np.int64)
+        self._entries: list[Mapping[str, Any] | None] = [None] * maxsize
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, question: str) -> np.ndarray:
+        vec = np.asarray(self.embedder.embed([question]), dtype=np.float32)[0]
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, question: str, top_k: int) -> Mapping[str, Any] | None:
+        vec = self._embed(question)
+        with self._lock:
+            sims = np.where(self._ks == top_k, self._vectors @ vec, -np.inf)
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            self._clock += 1
+            self._last_used[best] = self._clock
+            return self._entries[best]
+
+    def store(self, question: str, top_k: int, result: Mapping[str, Any]) -> None:
+        vec = self._embed(question)
+        with self._lock:
+            # hueco libre o, si no hay, el menos usado recientemente
+            slot = int(np.argmin(np.where(self._ks == -1, -1, self._last_used)))
+            self._clock += 1
+            self._vectors[slot] = vec
+            self._ks[slot] = top_k
+            self._last_used[slot] = self._clock
+            self._entries[slot] = result
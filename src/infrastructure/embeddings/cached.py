@@ -0,0 +1,143 @@
+"""
+Cachés delante de cualquier EmbedderPort: LRU en memoria y SQLite en disco.
+Preguntas repetidas no vuelven a pasar por el modelo.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+from src.core.ports import EmbedderPort
+
+
+def _cache_key(text: str) -> str:
+    # sólo espacios: el lowercase cambiaría el vector en modelos cased
+    return " ".join(text.split())
+
+
+class CachingEmbedder(EmbedderPort):
+    def __init__(self, inner: EmbedderPort, maxsize: int = 4096):
+        self.inner = inner
+        self.dim = inner.dim
+        self.maxsize = maxsize
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        keys = [_cache_key(t) for t in texts]
+        out = np.empty((len(keys), self.dim), dtype=np.float32)
+        missing: dict[str, list[int]] = {}
+        with self._lock:
+            for row, key in enumerate(keys):
+                vec = self._cache.get(key)
+                if vec is None:
+                    missing.setdefault(key, []).append(row)
+                else:
+                    self._cache.move_to_end(key)
+                    out[row] = vec
+        if not missing:
+            return out
+
+        # un único embed para todos los fallos (y cada texto repetido una sola vez)
+        vectors = np.asarray(self.inner.embed(list(missing)), dtype=np.float32)
+        with self._lock:
+            for (key, rows), vec in zip(missing.items(), vectors):
+                out[rows] = vec
+                self._cache[key] = vec.copy()  # sin retener la matriz del lote
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return out
+
+
+class DiskCachingEmbedder(EmbedderPort):
+    """
+    Caché persistente (SQLite) de embeddings en float16, clave
+    blake2b(modelo|texto): sobrevive a reinicios y cambiar de modelo no colisiona.
+    Al superar `max_entries` se descartan las entradas más antiguas (FIFO).
+    """
+
+    _SELECT_CHUNK = 500  # por debajo del límite de parámetros de SQLite
+
+    def __init__(
+        self,
+        inner: EmbedderPort,
+        path: str | Path,
+        model_name: str,
+        max_entries: int = 1_000_000,
+    ):
+        self.inner = inner
+        self.dim = inner.dim
+        self.model_name = model_name
+        self.max_entries = max_entries
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+        )
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[
+            0
+        ]
+        self._lock = threading.Lock()
+
+    def _key(self, text: str) -> bytes:
+        raw = f"{self.model_name}|{_cache_key(text)}".encode()
+        return hashlib.blake2b(raw, digest_size=16).digest()
+
+    def _lookup(self, keys: list[bytes]) -> dict[bytes, bytes]:
+        found: dict[bytes, bytes] = {}
+        for start in range(0, len(keys), self._SELECT_CHUNK):
+            chunk = keys[start : start + self._SELECT_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            found.update(
+                self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({marks})", chunk
+                )
+            )
+        return found
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        keys = [self._key(t) for t in texts]
+        out = np.empty((len(keys), self.dim), dtype=np.float32)
+        with self._lock:
+            found = self._lookup(list(dict.fromkeys(keys)))
+        missing: dict[bytes, tuple[str, list[int]]] = {}
+        for row, (key, text) in enumerate(zip(keys, texts)):
+            blob = found.get(key)
+            if blob is None:
+                missing.setdefault(key, (text, []))[1].append(row)
+            else:
+                out[row] = np.frombuffer(blob, dtype=np.float16)
+        if not missing:
+            return out
+
+        # sólo los fallos pasan por el modelo, en un único embed; redondeados a
+        # float16 como los aciertos: mismo vector (y ranking) con o sin caché
+        vectors = np.asarray(
+            self.inner.embed([text for text, _ in missing.values()]), dtype=np.float16
+        )
+        for (_, rows), vec in zip(missing.values(), vectors):
+            out[rows] = vec
+        payload = [(key, vec.tobytes()) for key, vec in zip(missing, vectors)]
+        with self._lock, self._conn:
+            cur = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vec) VALUES (?, ?)", payload
+            )
+            self._count += cur.rowcount
+            excess = self._count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)",
+                    (excess,),
+                )
+                self._count -= excess
+        return out
@@ -6,9 +6,10 @@ from __future__ import annotations
 
 from typing import Sequence
 
+import numpy as np
 from openai import APIError, OpenAI  # type: ignore
 
-from src.core.ports import EmbedderPort, Embedding
+from src.core.ports import EmbedderPort
 from src.settings import settings
 
 _MODEL_DIM: dict[str, int] = {
@@ -27,11 +28,28 @@ class OpenAIEmbedder(EmbedderPort):
     def __init__(self, model: str | None = None):
         self.model = model or settings.openai_embedding_model
         self.dim = _MODEL_DIM.get(self.model, DEFAULT_DIM)
-        self.client = OpenAI(api_key=settings.openai_api_key)
-
-    def embed(self, texts: Sequence[str]) -> Sequence[Embedding]:
-        try:
-            resp = self.client.embeddings.create(model=self.model, input=list(texts))
-        except APIError:
-            raise
-        return [item.embedding for item in resp.data]
+        self.client = OpenAI(
+            api_key=settings.openai_api_key, base_url=settings.openai_base_url
+        )
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Un request por cada `openai_embedding_batch_size` textos (no uno por texto)."""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        out: np.ndarray | None = None
+        step = settings.openai_embedding_batch_size
+        for start in range(0, len(texts), step):
+            chunk = texts[start : start + step]
+            try:
+                resp = self.client.embeddings.create(model=self.model, input=chunk)
+            except APIError:
+                raise
+            rows = np.asarray([item.embedding for item in resp.data], dtype=np.float32)
+            if out is None:
+                # la dimensión real la da la respuesta (modelo fuera de _MODEL_DIM,
+                # `dimensions=` en el endpoint...), no la tabla estática
+                self.dim = rows.shape[1]
+                out = np.empty((len(texts), self.dim), dtype=np.float32)
+            out[start : start + len(chunk)] = rows
+        return out
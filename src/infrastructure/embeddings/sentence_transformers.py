@@ -3,20 +3,77 @@ File: src/adapters/embeddings/sentence_transformers.p
 SentenceTransformer embedder (CPU-friendly).
 """
 
+import logging
+from functools import lru_cache
 from typing import Sequence
 
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
 from src.core.ports import EmbedderPort
+from src.settings import settings
 
-Embedding = Sequence[float]
+logger = logging.getLogger(__name__)
+
+
+def _resolve_dtype(model: SentenceTransformer, name: str):
+    """Devuelve el torch.dtype a aplicar o None si hay que quedarse en fp32."""
+    import torch
+
+    on_cuda = model.device.type == "cuda"
+    if name == "auto":
+        return torch.bfloat16 if on_cuda and torch.cuda.is_bf16_supported() else None
+    if name == "float16" and not on_cuda:
+        logger.warning("st_dtype=float16 requires a CUDA device; keeping float32.")
+        return None
+    return None if name == "float32" else getattr(torch, name)
+
+
+@lru_cache(maxsize=4)
+def _load_model(model_name: str, dtype_name: str) -> SentenceTransformer:
+    """
+    Un modelo por (nombre, dtype) y proceso: varios embedders (servicio, ingesta,
+    resets) comparten los mismos pesos en vez de cargarlos de nuevo.
+    """
+    # Caché local persistente; los pesos .safetensors se cargan vía mmap, así que
+    # los reinicios del proceso no re-leen ni copian el modelo completo
+    model = SentenceTransformer(
+        model_name,
+        cache_folder=settings.st_cache_folder,
+        local_files_only=settings.st_local_files_only,
+    )
+    # Pesos en media precisión: mitad de ancho de banda en los matmul del forward
+    dtype = _resolve_dtype(model, dtype_name)
+    if dtype is not None:
+        model = model.to(dtype=dtype)
+    return model
 
 
 class SentenceTransformerEmbedder(EmbedderPort):
 
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
-        self.dim = 384
+    def __init__(
+        self, model_name: str = "all-MiniLM-L6-v2", batch_size: int | None = None
+    ):
+        if settings.st_num_threads:
+            import torch
+
+            torch.set_num_threads(settings.st_num_threads)
+        self.model = _load_model(model_name, settings.st_dtype)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size or settings.st_batch_size
 
-    def embed(self, texts: Sequence[str]) -> Sequence[Embedding]:
-        return self.model.encode(list(texts)).tolist()
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Matriz (N, dim) float32 contigua, lista para FAISS sin conversiones."""
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        # Una sola llamada a encode: SentenceTransformer ordena internamente los textos
+        # por longitud (smart batching), agrupa lotes de batch_size con padding mínimo
+        # y devuelve los vectores en el orden original. No trocear ni llamar por item.
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        return vectors.astype(np.float32, copy=False)
@@ -0,0 +1,76 @@
+"""
+Caché en disco de los embeddings de una ingesta completa (float16, .npz).
+
+Si la clave (digest del CSV + modelo) coincide con la guardada, `embed` devuelve
+las filas cacheadas en orden sin cargar el modelo; si no, delega en el embedder
+real y graba los vectores al llamar a `save()`. Con `path=None` es un simple
+proxy perezoso (ni lee ni graba).
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Callable, Sequence
+
+import numpy as np
+
+from src.core.ports import EmbedderPort
+
+logger = logging.getLogger(__name__)
+
+
+class Fp16VectorCache(EmbedderPort):
+    def __init__(
+        self,
+        load_embedder: Callable[[], EmbedderPort],
+        path: str | Path | None,
+        key: str = "",
+    ):
+        self.path = Path(path) if path else None
+        self.key = key
+        self._load_embedder = load_embedder
+        self._embedder: EmbedderPort | None = None
+        self._cached: np.ndarray | None = None
+        self._pos = 0
+        self._parts: list[np.ndarray] = []
+        if self.path is not None and self.path.exists():
+            with np.load(self.path) as data:
+                if str(data["key"]) == key:
+                    self._cached = data["vectors"]
+        if self._cached is not None:
+            self.dim = self._cached.shape[1]
+            logger.info(
+                "Reusing %d cached vectors from %s", len(self._cached), self.path
+            )
+        else:
+            self.dim = self._inner().dim
+
+    @property
+    def hit(self) -> bool:
+        return self._cached is not None
+
+    def _inner(self) -> EmbedderPort:
+        if self._embedder is None:
+            self._embedder = self._load_embedder()
+        return self._embedder
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        n = len(texts)
+        if self._cached is not None and self._pos + n <= len(self._cached):
+            rows = self._cached[self._pos : self._pos + n]
+            self._pos += n
+            # fp16 -> fp32 sólo aquí, justo antes del add a FAISS
+            return rows.astype(np.float32)
+        vectors = self._inner().embed(texts)
+        if self.path is not None:
+            self._parts.append(np.asarray(vectors, dtype=np.float16))
+        return vectors
+
+    def save(self) -> None:
+        """Graba los vectores calculados (no hace nada si todo vino de la caché)."""
+        if self.path is None or self.hit or not self._parts:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("wb") as f:  # file handle: np.savez no añade sufijo
+            np.savez(f, key=np.array(self.key), vectors=np.concatenate(self._parts))
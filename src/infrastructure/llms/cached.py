@@ -0,0 +1,94 @@
+# src/infrastructure/llms/cached.py
+
+"""
+LRU en memoria delante de cualquier GeneratorPort: la misma pregunta con los
+mismos contextos recuperados devuelve la respuesta ya generada sin llamar al LLM.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Sequence
+
+from src.core.ports import GeneratorPort
+
+
+def _prompt_key(question: str, contexts: Sequence[str]) -> bytes:
+    # cada parte con su longitud delante: ningún separador es ambiguo
+    h = hashlib.blake2b(digest_size=16)
+    for part in (question, *contexts):
+        data = part.encode("utf-8")
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    return h.digest()
+
+
+class CachingGenerator(GeneratorPort):
+    def __init__(self, inner: GeneratorPort, maxsize: int = 1024):
+        self.inner = inner
+        self.maxsize = maxsize
+        self._cache: OrderedDict[bytes, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: bytes) -> str | None:
+        with self._lock:
+            answer = self._cache.get(key)
+            if answer is not None:
+                self._cache.move_to_end(key)
+            return answer
+
+    def _put(self, key: bytes, answer: str) -> str:
+        with self._lock:
+            self._cache[key] = answer
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return answer
+
+    def generate(self, question: str, contexts: Sequence[str]) -> str:
+        key = _prompt_key(question, contexts)
+        answer = self._get(key)
+        if answer is None:
+            # los errores del LLM se propagan y no se cachean
+            answer = self._put(key, self.inner.generate(question, contexts))
+        return answer
+
+    async def agenerate(self, question: str, contexts: Sequence[str]) -> str:
+        key = _prompt_key(question, contexts)
+        answer = self._get(key)
+        if answer is not None:
+            return answer
+        agenerate = getattr(self.inner, "agenerate", None)
+        if agenerate is not None:
+            answer = await agenerate(question, contexts)
+        else:
+            answer = await asyncio.to_thread(self.inner.generate, question, contexts)
+        return self._put(key, answer)
+
+    async def astream(
+        self, question: str, contexts: Sequence[str]
+    ) -> AsyncIterator[str]:
+        """Acierto: la respuesta entera en un fragmento; fallo: stream del LLM."""
+        key = _prompt_key(question, contexts)
+        answer = self._get(key)
+        if answer is not None:
+            yield answer
+            return
+        astream = getattr(self.inner, "astream", None)
+        if astream is None:
+            yield await self.agenerate(question, contexts)
+            return
+        parts = []
+        async for part in astream(question, contexts):
+            parts.append(part)
+            yield part
+        # sólo streams completos: uno cortado a medias no llega aquí
+        self._put(key, "".join(parts))
+
+    async def aclose(self) -> None:
+        aclose = getattr(self.inner, "aclose", None)
+        if aclose is not None:
+            await aclose()
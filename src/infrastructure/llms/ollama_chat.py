@@ -1,9 +1,14 @@
-# src/adapters/generation/ollama_chat.py
+# src/infrastructure/llms/ollama_chat.py
+import asyncio
 import logging
+from functools import lru_cache
 from typing import List
 
+import httpx
 import requests
 from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from src.core.ports import GeneratorPort
 from src.settings import (  # settings.ollama_base_url y settings.ollama_request_timeout exists
@@ -13,56 +18,115 @@ from src.settings import (  # settings.ollama_base_url y settings.ollama_request
 logger = logging.getLogger(__name__)
 
 
+_PROMPT_TMPL = (
+    "Based on the following context, please answer the question.\n"
+    "If the context does not provide an answer, say so.\n\n"
+    "CONTEXT:\n{ctx}\n\nQUESTION:\n{q}"
+)
+
+
+@lru_cache(maxsize=1)
+def _shared_session() -> requests.Session:
+    """
+    Sesión keep-alive común: el socket al servidor Ollama se reutiliza entre
+    llamadas (sin handshake TCP por pregunta). Reintenta conexiones fallidas y
+    502/503/504 con backoff; los read timeouts no (doblarían la espera).
+    """
+    retry = Retry(
+        total=2,
+        read=0,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False,  # último intento -> raise_for_status -> HTTPError
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 class OllamaGenerator(GeneratorPort):
-    def generate(self, question: str, contexts: List[str]) -> str:
-        ctx_block = "\n".join(f"- {c}" for c in contexts)
-        full_prompt = (
-            "Based on the following context, please answer the question.\nIf the context does not provide an answer, say so.\n\n"
-            "CONTEXT:\n"
-            f"{ctx_block}\n\n"
-            "QUESTION:\n"
-            f"{question}"
+    def __init__(self):
+        # perezoso y por event loop: un AsyncClient no sirve en otro loop (siguiente
+        # asyncio.run, TestClient); aclose() lo cierra en el shutdown del lifespan
+        self._aclient: httpx.AsyncClient | None = None
+        self._aclient_loop: asyncio.AbstractEventLoop | None = None
+
+    @staticmethod
+    def _make_aclient() -> httpx.AsyncClient:
+        # pool acotado: un aask_batch con gather no abre un socket por pregunta
+        return httpx.AsyncClient(
+            timeout=settings.ollama_request_timeout,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
         )
 
-        payload = {
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._aclient is None or self._aclient_loop is not loop:
+            self._aclient, self._aclient_loop = self._make_aclient(), loop
+        return self._aclient
+
+    async def aclose(self) -> None:
+        """Cierra el cliente async si es del loop actual (el de otro loop ya no sirve)."""
+        client, loop = self._aclient, self._aclient_loop
+        self._aclient = self._aclient_loop = None
+        if client is not None and loop is asyncio.get_running_loop():
+            await client.aclose()
+
+    @staticmethod
+    def _api_url() -> str:
+        return f"{settings.ollama_base_url.rstrip('/')}/api/generate"
+
+    @staticmethod
+    def _payload(question: str, contexts: List[str]) -> dict:
+        ctx_block = "- " + "\n- ".join(contexts) if contexts else ""
+        return {
             "model": settings.ollama_model,
-            "prompt": full_prompt,
-            "stream": False,  # Ollama by default returns the full response if stream equals false
+            "prompt": _PROMPT_TMPL.format(ctx=ctx_block, q=question),
+            # Ollama by default returns the full response if stream equals false
+            "stream": False,
             # "options": {"temperature": 0.7} #  OPTIONAL
         }
 
-        base_url = settings.ollama_base_url.rstrip("/")
-        api_url = f"{base_url}/api/generate"
+    @staticmethod
+    def _parse(response_data) -> str:
+        # The endpoint /api/generate retuns a JSON where every line it's a JSON
+        # if stream = True (default), else only 1 json with full answer.
+        # when stream=False:
+        # {
+        #   "model": "...", "created_at": "...", "response": "...", "done": true,
+        #   "context": [...], "total_duration": ..., ...
+        # }
+        if "response" in response_data and isinstance(response_data["response"], str):
+            return response_data["response"].strip()
+        # logger.warning(f"Ollama response malformed. Data: {response_data}")
+        raise HTTPException(
+            500,
+            detail="Ollama response malformed: 'response' key missing or not a string.",
+        )
+
+    def generate(self, question: str, contexts: List[str]) -> str:
+        payload = self._payload(question, contexts)
+        api_url = self._api_url()
 
         try:
-            response = requests.post(
+            response = _shared_session().post(
                 api_url, json=payload, timeout=settings.ollama_request_timeout
             )
             response.raise_for_status()  # HTTP codes 4xx/5xx
+            return self._parse(response.json())
 
-            response_data = response.json()
-
-            # The endpoint /api/generate retuns a JSON where every line it's a JSON if stream = True (default), else only 1 json with full answer:
-            # when stream=False:
-            # {
-            #   "model": "...", "created_at": "...", "response": "...", "done": true,
-            #   "context": [...], "total_duration": ..., ...
-            # }
-            if "response" in response_data and isinstance(
-                response_data["response"], str
-            ):
-                return response_data["response"].strip()
-            else:
-                # logger.warning(f"Ollama response malformed. Data: {response_data}")
-                raise HTTPException(
-                    500,
-                    detail="Ollama response malformed: 'response' key missing or not a string.",
-                )
-
+        except HTTPException:
+            raise
         except requests.exceptions.Timeout as err:
             raise HTTPException(
                 504,
-                detail=f"Ollama request timed out after {settings.ollama_request_timeout}s: {api_url}",
+                detail=(
+                    "Ollama request timed out after "
+                    f"{settings.ollama_request_timeout}s: {api_url}"
+                ),
             ) from err
         except requests.exceptions.ConnectionError as err:
             raise HTTPException(
@@ -75,7 +139,8 @@ class OllamaGenerator(GeneratorPort):
                 status_code, detail=f"Ollama API error: {error_content}"
             ) from err
         except requests.exceptions.JSONDecodeError as err:
-            # logger.error(f"Failed to decode Ollama JSON response. Status: {response.status_code}, Content: {response.text}")
+            # logger.error(f"Failed to decode Ollama JSON response. "
+            #              f"Status: {response.status_code}, Content: {response.text}")
             raise HTTPException(
                 500,
                 detail=f"Failed to decode Ollama JSON response. Original error: {str(err)}",
@@ -85,3 +150,41 @@ class OllamaGenerator(GeneratorPort):
             raise HTTPException(
                 500, detail=f"Unexpected error during Ollama call: {str(e)}"
             ) from e
+
+    async def agenerate(self, question: str, contexts: List[str]) -> str:
+        """Versión async (httpx): el event loop sigue atendiendo mientras Ollama genera."""
+        api_url = self._api_url()
+        try:
+            response = await self._async_client().post(
+                api_url, json=self._payload(question, contexts)
+            )
+            response.raise_for_status()
+            return self._parse(response.json())
+        except HTTPException:
+            raise
+        except httpx.TimeoutException as err:
+            raise HTTPException(
+                504,
+                detail=(
+                    "Ollama request timed out after "
+                    f"{settings.ollama_request_timeout}s: {api_url}"
+                ),
+            ) from err
+        except httpx.ConnectError as err:
+            raise HTTPException(
+                503, detail=f"Could not connect to Ollama server at {api_url}"
+            ) from err
+        except httpx.HTTPStatusError as err:
+            raise HTTPException(
+                err.response.status_code,
+                detail=f"Ollama API error: {err.response.text}",
+            ) from err
+        except ValueError as err:
+            raise HTTPException(
+                500,
+                detail=f"Failed to decode Ollama JSON response. Original error: {str(err)}",
+            ) from err
+        except Exception as e:
+            raise HTTPException(
+                500, detail=f"Unexpected error during Ollama call: {str(e)}"
+            ) from e
@@ -6,18 +6,34 @@ Cumple los tests:
 * `generate()` construye prompt exactamente como esperan los asserts.
 * Maneja `APIError` y lo convierte a `HTTPException 502`.
 """
+
 from __future__ import annotations
 
-from typing import List
+from functools import lru_cache
+from typing import AsyncIterator, List
 
+import httpx
 from fastapi import HTTPException
-from openai import OpenAI  # type: ignore
+from openai import AsyncOpenAI, OpenAI  # type: ignore
 
 from src.core.ports import GeneratorPort
 from src.settings import settings
 
 __all__ = ["OpenAIGenerator"]
 
+# Parte estática primero (mensaje system idéntico en cada request) y lo variable
+# al final: el prefijo común es lo que reutiliza la prompt cache del proveedor
+_SYSTEM_PROMPT = "Answer using ONLY the context provided."
+_PROMPT_TMPL = "CONTEXT:\n{ctx}\n\nQUESTION: {q}"
+
+
+@lru_cache(maxsize=1)
+def _shared_http_client() -> httpx.Client:
+    """Pool keep-alive común a todos los generadores: sin TLS handshake por request."""
+    return httpx.Client(
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+    )
+
 
 class OpenAIGenerator(GeneratorPort):
     """Adapter para chat‑completion de OpenAI v1.x"""
@@ -29,40 +45,91 @@ class OpenAIGenerator(GeneratorPort):
         self.temperature = (
             temperature if temperature is not None else settings.openai_temperature
         )
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        self.client = OpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            http_client=_shared_http_client(),
+        )
+        self._aclient: AsyncOpenAI | None = None  # perezoso: sólo si se usa agenerate
 
     # ------------------------------------------------------------------
     def _build_prompt(self, question: str, contexts: List[str]) -> str:
-        ctx_block = "\n".join(f"- {c}" for c in contexts)
-        return (
-            "Answer using ONLY the context provided.\n\n"
-            f"CONTEXT:\n{ctx_block}\n\n"
-            f"QUESTION: {question}"
+        # un único join sobre la lista (sin generador por chunk) + plantilla fija
+        ctx_block = "- " + "\n- ".join(contexts) if contexts else ""
+        return _PROMPT_TMPL.format(ctx=ctx_block, q=question)
+
+    def _request(self, question: str, contexts: List[str], temperature):
+        temperature = (
+            temperature if temperature is not None else settings.openai_temperature
+        )
+        return dict(
+            model=self.model,
+            temperature=temperature,
+            top_p=settings.openai_top_p,
+            max_tokens=settings.openai_max_tokens,
+            messages=[
+                {"role": "system", "content": _SYSTEM_PROMPT},
+                {"role": "user", "content": self._build_prompt(question, contexts)},
+            ],
         )
 
     def generate(
         self, question: str, contexts: List[str], temperature: float = None
     ) -> str:
-        temperature = (
-            temperature if temperature is not None else settings.openai_temperature
-        )
-        prompt = self._build_prompt(question, contexts)
         try:
             resp = self.client.chat.completions.create(
-                model=self.model,
-                temperature=temperature,
-                top_p=settings.openai_top_p,
-                max_tokens=settings.openai_max_tokens,
-                messages=[{"role": "user", "content": prompt}],
+                **self._request(question, contexts, temperature)
             )
         except HTTPException:
             # re-lanzar HTTPExceptions (timeouts, etc.)
             raise
         except Exception as err:
-            # Aquí “pillamos” tanto APIError real como TypeError de test-stub
-            raise HTTPException(
-                status_code=502,
-                detail=f"OpenAI API Error: {getattr(err, 'message', str(err))}",
-            ) from err
+            raise _as_http_error(err) from err
+        return resp.choices[0].message.content  # type: ignore[attr-defined]
+
+    def _async_client(self) -> AsyncOpenAI:
+        if self._aclient is None:
+            self._aclient = AsyncOpenAI(
+                api_key=settings.openai_api_key, base_url=settings.openai_base_url
+            )
+        return self._aclient
 
+    async def agenerate(
+        self, question: str, contexts: List[str], temperature: float = None
+    ) -> str:
+        """Versión async (AsyncOpenAI): no ocupa un hilo mientras espera al LLM."""
+        try:
+            resp = await self._async_client().chat.completions.create(
+                **self._request(question, contexts, temperature)
+            )
+        except HTTPException:
+            # re-lanzar HTTPExceptions (timeouts, etc.)
+            raise
+        except Exception as err:
+            raise _as_http_error(err) from err
         return resp.choices[0].message.content  # type: ignore[attr-defined]
+
+    async def astream(
+        self, question: str, contexts: List[str], temperature: float = None
+    ) -> AsyncIterator[str]:
+        """Fragmentos de texto según llegan (stream=True), sin esperar al final."""
+        try:
+            stream = await self._async_client().chat.completions.create(
+                **self._request(question, contexts, temperature), stream=True
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        except HTTPException:
+            raise
+        except Exception as err:
+            raise _as_http_error(err) from err
+
+
+def _as_http_error(err: Exception) -> HTTPException:
+    # Aquí “pillamos” tanto APIError real como TypeError de test-stub
+    return HTTPException(
+        status_code=502,
+        detail=f"OpenAI API Error: {getattr(err, 'message', str(err))}",
+    )
@@ -1,7 +1,9 @@
-# src/adapters/storage/faiss_crud.py
+# src/infrastructure/persistence/faiss/faiss_.py
 
 from typing import Sequence
 
+import numpy as np
+
 from src.core.ports import VectorRepoPort
 from src.infrastructure.persistence.faiss.index import FaissIndex
 
@@ -11,16 +13,21 @@ class FaissVectorStorage(VectorRepoPort):
     Adapter que implementa VectorRepoPort usando FAISS.
     """
 
-    def __init__(self, index_path: str, id_map_path: str):
-        self.faiss_index = FaissIndex(index_path, id_map_path)
+    def __init__(self, index_path: str, id_map_path: str, dim: int = 384):
+        self.faiss_index = FaissIndex(index_path, id_map_path, dim=dim)
+
+    def upsert(
+        self, ids: Sequence[int], vectors: np.ndarray, flush: bool = True
+    ) -> None:
+        # ids y vectores pasan tal cual (ndarray): sin listas intermedias
+        self.faiss_index.add_to_index(ids, vectors, flush=flush)
 
-    def upsert(self, ids: Sequence[int], vectors: Sequence[Sequence[float]]) -> None:
-        self.faiss_index.add_to_index(list(ids), list(vectors))
+    def flush(self) -> None:
+        self.faiss_index.flush()
 
-    def similar(self, vector, k: int):
-        idxs, dists = self.faiss_index.search(vector, k)
-        real_ids = [self.faiss_index.id_map[i] for i in idxs if i != -1]
-        return list(zip(real_ids, dists))
+    def similar(self, vector: np.ndarray, k: int):
+        ids, dists = self.faiss_index.search(vector, k)
+        return [(int(i), d) for i, d in zip(ids, dists) if i != -1]
 
 
 """
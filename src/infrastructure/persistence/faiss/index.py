@@ -1,41 +1,357 @@
+import logging
+import math
+import os
 import pickle
+import warnings
 from pathlib import Path
-from typing import List, Sequence
+from typing import Sequence
 
 import faiss  # type: ignore
 import numpy as np
 
+from src.settings import settings
+from src.utils import file_lock
+
+logger = logging.getLogger(__name__)
+
+if settings.faiss_num_threads:
+    faiss.omp_set_num_threads(settings.faiss_num_threads)
+elif os.environ.get("OMP_NUM_THREADS") == "1":
+    logger.warning("OMP_NUM_THREADS=1: FAISS search will run single-threaded.")
+
 
 class FaissIndex:
-    def __init__(self, index_path, id_map_path, dim=384):
+    def __init__(self, index_path, id_map_path, dim=384, mmap: bool = False):
         self.index_path = Path(index_path)
         self.id_map_path = Path(id_map_path)
         self.dim = dim
+        self.mmap = mmap
+        self.read_only = False
+        self.on_gpu = False
+        self._dirty = False  # vectores añadidos aún no grabados (flush=False)
+        # índice vacío + flush=False: lotes (ids, vectores) acumulados hasta saber
+        # cuántos hay, para elegir Flat/IVF y entrenar con todos ellos
+        self._pending: list[tuple[np.ndarray, np.ndarray]] = []
+        self._pending_rows = 0
         self._load()
+        if settings.faiss_use_gpu and self.index.ntotal:
+            self._to_gpu()
 
     def _load(self):
         if self.index_path.exists():
-            self.index = faiss.read_index(str(self.index_path))
+            self.index = self._read()
+            if not self.read_only and self._needs_conversion():
+                self._convert_once()
+            self._set_search_params()
+        else:
+            # Vectores normalizados: producto interno == similitud coseno.
+            # IDMap2: FAISS guarda los ids de BD y search los devuelve directamente.
+            self.index = faiss.index_factory(
+                self.dim, "IDMap2,Flat", faiss.METRIC_INNER_PRODUCT
+            )
+
+    def _read(self):
+        """
+        Con `mmap`, las listas invertidas de un IVF se mapean desde el fichero en
+        vez de copiarse al heap: arranque casi inmediato y páginas compartidas
+        entre workers. Flat/HNSW no admiten mmap y se leen completos igualmente.
+        """
+        path = str(self.index_path)
+        if not self.mmap:
+            return faiss.read_index(path)
+        index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        if not isinstance(index, faiss.IndexIDMap2):
+            return faiss.read_index(path)  # legacy: se migra en memoria
+        try:
+            faiss.extract_index_ivf(index)
+        except RuntimeError:
+            return index  # no IVF: lectura completa, modificable
+        self.read_only = True  # listas en disco: sólo búsqueda
+        return index
+
+    def _to_gpu(self):
+        """
+        Copia el índice (ya cargado y ajustado) a todas las GPUs si hay build
+        faiss-gpu y dispositivo; si no, se queda en CPU con un aviso. Sólo índices
+        con vectores: el primer lote se construye y entrena en CPU.
+        """
+        if not hasattr(faiss, "GpuMultipleClonerOptions") or not faiss.get_num_gpus():
+            logger.warning("faiss_use_gpu is set but no FAISS GPU device; using CPU.")
+            return
+        co = faiss.GpuMultipleClonerOptions()
+        co.useFloat16 = True
+        if hasattr(co, "use_cuvs"):  # faiss >= 1.10 compilado con cuVS
+            co.use_cuvs = settings.faiss_use_cuvs
+        try:
+            self.index = faiss.index_cpu_to_all_gpus(self.index, co)
+        except RuntimeError as err:  # p.ej. HNSW no tiene versión GPU
+            logger.warning("FAISS index kept on CPU (no GPU clone): %s", err)
+            return
+        self.on_gpu = True
+
+    @property
+    def id_map(self) -> np.ndarray:
+        """Ids de BD en orden de inserción (int64), leídos del propio índice."""
+        return faiss.vector_to_array(self.index.id_map)
+
+    def _needs_conversion(self) -> bool:
+        return not isinstance(self.index, faiss.IndexIDMap2) or self._should_upgrade()
+
+    def _convert_once(self):
+        """
+        Migración legacy y/o upgrade de Flat grande, grabados una sola vez: el lock
+        serializa los workers; el primero convierte y graba (tmp + os.replace), los
+        demás releen el fichero ya convertido. Sin permiso de escritura, sólo en memoria.
+        """
+        lock_path = self.index_path.with_name(self.index_path.name + ".lock")
+        try:
+            with file_lock(lock_path):
+                self.index = self._read()  # otro worker pudo grabarlo mientras tanto
+                if not self.read_only and self._convert():
+                    self.save()
+            return
+        except OSError as err:
+            logger.warning("FAISS index converted in memory only (not saved): %s", err)
+        self._convert()  # idempotente: si ya se convirtió antes del fallo, no-op
+
+    def _convert(self) -> bool:
+        changed = False
+        if not isinstance(self.index, faiss.IndexIDMap2):
+            self._migrate_legacy_index()
+            changed = True
+        if self._should_upgrade():
+            self._upgrade_index()
+            changed = True
+        return changed
+
+    def _migrate_legacy_index(self):
+        """Índice posicional + id_map aparte (.npy/.pkl) -> IndexIDMap2."""
+        legacy, n = self.index, self.index.ntotal
+        ids = self._load_legacy_id_map()
+        if len(ids) != n:
+            logger.warning(
+                "Legacy FAISS index has %d vectors but id map has %d; "
+                "using positional ids.",
+                n,
+                len(ids),
+            )
+            ids = np.arange(n, dtype=np.int64)
+        try:
+            vectors = legacy.reconstruct_n(0, n)
+        except RuntimeError:  # IVF: requiere direct map para reconstruir
+            faiss.extract_index_ivf(legacy).make_direct_map()
+            vectors = legacy.reconstruct_n(0, n)
+        base = faiss.clone_index(legacy)
+        base.reset()  # conserva el entrenamiento, vacía los vectores
+        self.index = faiss.IndexIDMap2(base)
+        self.index.add_with_ids(vectors, np.ascontiguousarray(ids, dtype=np.int64))
+        logger.info("Migrated legacy FAISS index to IndexIDMap2 at %s", self.index_path)
+
+    def _should_upgrade(self) -> bool:
+        threshold = settings.faiss_flat_threshold
+        return (
+            bool(threshold)
+            and isinstance(faiss.downcast_index(self.index.index), faiss.IndexFlat)
+            and self.index.ntotal > threshold
+        )
+
+    def _upgrade_index(self):
+        """Flat con más de `faiss_flat_threshold` vectores -> HNSW o IVF-PQ."""
+        flat = faiss.downcast_index(self.index.index)
+        n = self.index.ntotal
+        if settings.faiss_upgrade_to == "ivfpq":
+            factory = self._ivfpq_factory(n, flat.d)
         else:
-            self.index = faiss.IndexFlatL2(self.dim)
-        if self.id_map_path.exists():
+            factory = f"HNSW{settings.faiss_hnsw_m},{self._storage_factory()}"
+        logger.info("Upgrading flat FAISS index (%d vectors) to %s...", n, factory)
+        upgraded = self._tune_build(
+            faiss.index_factory(flat.d, factory, flat.metric_type)
+        )
+        # vectores e ids antes de soltar el índice viejo (`flat` apunta dentro de él)
+        vectors, ids = flat.reconstruct_n(0, n), self.id_map
+        if not upgraded.is_trained:  # IVF: centroides; SQ8/SQfp16: rangos por dimensión
+            upgraded.train(vectors)
+        self.index = faiss.IndexIDMap2(upgraded)
+        self.index.add_with_ids(vectors, ids)
+
+    def _load_legacy_id_map(self) -> np.ndarray:
+        """int64 .npy mapeado en memoria o lista pickle de versiones anteriores."""
+        if not self.id_map_path.exists():
+            return np.empty(0, dtype=np.int64)
+        try:
+            return np.load(self.id_map_path, mmap_mode="r")
+        except ValueError:  # formato legacy: lista pickle
+            warnings.warn(
+                f"Pickled id map {self.id_map_path} is deprecated; "
+                "the index is migrated to embed its ids.",
+                DeprecationWarning,
+                stacklevel=2,
+            )
             with self.id_map_path.open("rb") as f:
-                self.id_map = pickle.load(f)
+                return np.asarray(pickle.load(f), dtype=np.int64)
+
+    @property
+    def is_cosine(self) -> bool:
+        return self.index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+    def _prepare(self, vectors) -> np.ndarray:
+        if self.is_cosine:
+            # copia propia: normalize_L2 trabaja in-place
+            vectors = np.array(vectors, dtype=np.float32)
+            faiss.normalize_L2(vectors)
+            return vectors
+        # L2: un ndarray float32 contiguo (lo que devuelven los embedders) pasa sin copia
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    @staticmethod
+    def _storage_factory() -> str:
+        """Codificación de vectores planos: float32 (4 B/dim), fp16 (2 B) o int8 (1 B)."""
+        return {"float16": "SQfp16", "int8": "SQ8"}.get(
+            settings.faiss_vector_dtype, "Flat"
+        )
+
+    def _factory_string(self, n: int) -> str:
+        factory = settings.faiss_index_factory
+        if factory != "auto":
+            return factory
+        storage = self._storage_factory()
+        if n < settings.faiss_ivf_threshold:
+            return storage
+        if storage != "Flat":
+            # float16/int8 pedidos explícitamente: IVF con escalar cuantizado (SQ8 =
+            # 1 B/dim, mejor recall que PQ); float32 sigue yendo a IVF-PQ
+            return f"IVF{self._nlist(n)},{storage}"
+        return self._ivfpq_factory(n, self.dim)
+
+    @staticmethod
+    def _nlist(n: int) -> int:
+        # nlist ~ 4·sqrt(N)
+        return settings.faiss_ivf_nlist or int(4 * math.sqrt(n))
+
+    @classmethod
+    def _ivfpq_factory(cls, n: int, dim: int) -> str:
+        # PQ de hasta 16 sub-vectores de faiss_pq_nbits bits (M debe dividir a d)
+        m = settings.faiss_pq_m or next(m for m in (16, 8, 4, 2, 1) if dim % m == 0)
+        return f"IVF{cls._nlist(n)},PQ{m}x{settings.faiss_pq_nbits}"
+
+    def _set_search_params(self):
+        if isinstance(faiss.downcast_index(self.index.index), faiss.IndexHNSW):
+            faiss.ParameterSpace().set_index_parameter(
+                self.index, "efSearch", settings.faiss_hnsw_ef_search
+            )
+            return
+        try:
+            faiss.extract_index_ivf(self.index)
+        except RuntimeError:
+            return  # no es IVF: nada que ajustar
+        faiss.ParameterSpace().set_index_parameter(
+            self.index, "nprobe", settings.faiss_nprobe
+        )
+        # 2 = paraleliza dentro de cada consulta (sobre las listas invertidas):
+        # el caso típico aquí es una pregunta cada vez, no lotes grandes
+        faiss.extract_index_ivf(self.index).parallel_mode = 2
+
+    @staticmethod
+    def _tune_build(index):
+        """HNSW: grafo de más calidad al construir (efConstruction 200, default 40)."""
+        inner = faiss.downcast_index(
+            index.index if isinstance(index, faiss.IndexIDMap2) else index
+        )
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efConstruction = 200
+        return index
+
+    def _build_for(self, vectors: np.ndarray):
+        """Elige el tipo de índice según los vectores iniciales y lo entrena."""
+        factory = self._factory_string(len(vectors))
+        if factory != "Flat":
+            self.index = self._tune_build(
+                faiss.index_factory(
+                    self.dim, f"IDMap2,{factory}", self.index.metric_type
+                )
+            )
+        if not self.index.is_trained:
+            self.index.train(vectors)
+        self._set_search_params()
+
+    def add_to_index(
+        self, ids: Sequence[int], embeddings: np.ndarray, flush: bool = True
+    ):
+        """
+        Añade y graba. Con `flush=False` sólo marca el índice como pendiente: una
+        ingesta por lotes llama a `flush()` al final y escribe el fichero una vez,
+        no una reescritura completa (O(N)) por lote.
+        """
+        if self.read_only:
+            raise RuntimeError(
+                f"FAISS index {self.index_path} is memory-mapped read-only; "
+                "rebuild it with build_index instead."
+            )
+        vectors = self._prepare(embeddings)
+        if len(vectors) == 0:
+            return
+        if vectors.ndim != 2 or vectors.shape[1] != self.index.d:
+            raise ValueError(
+                f"Expected vectors of shape (N, {self.index.d}), got {vectors.shape}"
+            )
+        ids = np.ascontiguousarray(ids, dtype=np.int64)
+        self._dirty = True
+        if self.index.ntotal == 0:
+            # una ingesta por lotes pequeños (ingest_chunk_size < faiss_ivf_threshold)
+            # no debe fijar Flat ni entrenar el IVF con el primer lote: se acumula
+            # hasta el umbral o hasta el flush del final del stream
+            self._pending.append((ids, vectors))
+            self._pending_rows += len(ids)
+            if self._pending_rows >= settings.faiss_ivf_threshold:
+                self._build_pending()
         else:
-            self.id_map = []
+            self.index.add_with_ids(vectors, ids)
+        if flush:
+            self.flush()
+
+    def _build_pending(self) -> None:
+        ids = np.concatenate([i for i, _ in self._pending])
+        vectors = np.concatenate([v for _, v in self._pending])
+        self._pending, self._pending_rows = [], 0
+        self._build_for(vectors)
+        self.index.add_with_ids(vectors, ids)
+
+    def flush(self) -> None:
+        """Construye el índice con los lotes acumulados y lo graba si hay cambios."""
+        if self._pending:
+            self._build_pending()
+        if self._dirty:
+            self.save()
+
+    def search(self, query_vector: np.ndarray, k: int):
+        """Devuelve (ids de BD, scores); -1 donde no hay resultado."""
+        # (1, d) como vista del vector: sin lista intermedia ni copia
+        ids, scores = self.search_batch(
+            np.asarray(query_vector, dtype=np.float32).reshape(1, -1), k
+        )
+        return ids[0], scores[0]
 
-    def add_to_index(self, ids: List[int], embeddings: List[Sequence[float]]):
-        vectors = np.asarray(embeddings, dtype="float32")
-        self.index.add(vectors)
-        self.id_map.extend(ids)
-        self.save()
+    def search_batch(self, query_vectors: np.ndarray, k: int):
+        """Una sola llamada a FAISS para N consultas: matrices (N, k) de ids y scores."""
+        vectors = self._prepare(query_vectors)
+        k = min(k, self.index.ntotal)
+        if k <= 0:
+            empty = np.empty((len(vectors), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        scores, ids = self.index.search(vectors, k)
+        return ids, scores
 
-    def search(self, query_vector: Sequence[float], k: int):
-        vectors = np.asarray([query_vector], dtype="float32")
-        scores, idxs = self.index.search(vectors, k)
-        return idxs[0], scores[0]
+    def warm(self) -> None:
+        """Búsqueda sintética: fallos de página e hilos OMP antes del primer /ask."""
+        if self.index.ntotal:
+            self.search_batch(np.ones((1, self.index.d), dtype=np.float32), 1)
 
     def save(self):
-        faiss.write_index(self.index, str(self.index_path))
-        with self.id_map_path.open("wb") as f:
-            pickle.dump(self.id_map, f)
+        # un único artefacto: los ids viajan dentro del índice. Fichero temporal +
+        # rename atómico: un proceso con el índice anterior mapeado (mmap) sigue
+        # leyendo su inodo intacto en vez de uno truncado a mitad de escritura
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        index = faiss.index_gpu_to_cpu(self.index) if self.on_gpu else self.index
+        faiss.write_index(index, str(tmp_path))
+        os.replace(tmp_path, self.index_path)
+        self._dirty = False
@@ -3,12 +3,54 @@ File: src/db/base.py
 SQLAlchemy database connection configuration.
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from src.settings import settings
 
-engine = create_engine(settings.sqlite_url, connect_args={"check_same_thread": False})
+# WAL: lecturas sin bloquear al escritor; synchronous=NORMAL: ~1 fsync por commit
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",  # 64 MB de page cache
+    # lecturas vía mmap (hasta 256 MB): sin copiar páginas al page cache de SQLite
+    "PRAGMA mmap_size=268435456",
+)
+
+
+def _set_sqlite_pragmas(dbapi_conn, _connection_record):
+    cursor = dbapi_conn.cursor()
+    try:
+        for pragma in _SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def make_engine(url: str, **kwargs):
+    """create_engine + PRAGMAs de rendimiento en cada conexión SQLite."""
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **kwargs)
+    if url.startswith("sqlite"):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def _pool_options(url: str) -> dict:
+    """Pool del engine de la app: conexiones reutilizadas entre peticiones."""
+    if make_url(url).database in (None, "", ":memory:"):
+        return {}  # SQLite en memoria: SingletonThreadPool, sin pool_size
+    # los endpoints síncronos corren en el threadpool de FastAPI (40 hilos):
+    # pool_size + max_overflow los cubre sin esperar por conexión
+    return {
+        "pool_size": settings.sqlite_pool_size,
+        "max_overflow": settings.sqlite_max_overflow,
+        "pool_pre_ping": False,  # archivo local: no hay conexiones que caduquen
+    }
+
+
+engine = make_engine(settings.sqlite_url, **_pool_options(settings.sqlite_url))
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 Base = declarative_base()
 
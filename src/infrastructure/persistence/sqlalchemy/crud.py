@@ -1,4 +1,8 @@
-# src/infrastructure/persistence/crud.py
+# src/infrastructure/persistence/sqlalchemy/crud.py
+from itertools import islice
+from typing import Iterable
+
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 
 from src.infrastructure.persistence.sqlalchemy.models import Document, QaHistory
@@ -9,48 +13,78 @@ def get_documents(db: Session, ids: list[int]):
     return db.query(Document).filter(Document.id.in_(ids)).all()
 
 
-def add_documents(db: Session, texts: list[str]) -> list[int | None]:
+def _insert_chunk(db: Session, texts: list[str]) -> list[int]:
+    """INSERT de un lote dentro de la transacción en curso; ids en el orden de `texts`."""
+    # INSERT ... RETURNING id en todos los dialectos (SQLite >= 3.35 incluido): los
+    # ids vuelven con la propia inserción, sin suponer rowids consecutivos.
+    # SQLAlchemy agrupa las filas en INSERTs multi-VALUES ("insertmanyvalues")
+    stmt = insert(Document).returning(Document.id, sort_by_parameter_order=True)
+    return list(db.execute(stmt, [{"content": t} for t in texts]).scalars())
+
+
+def add_documents(db: Session, texts: list[str]) -> list[int]:
     """
     Adds multiple documents to the database from a list of text contents
     and returns a list of their assigned IDs.
     """
     if not texts:
         return []
+    ids = _insert_chunk(db, texts)
+    db.commit()
+    return ids
 
-    # 1. Crear instancias de Document
-    doc_objects = [Document(content=t) for t in texts]
-
-    # 2. Añadir todas las instancias a la sesión
-    db.add_all(doc_objects)
 
-    # 3.commit
+def add_documents_stream(
+    db: Session, texts: Iterable[str], chunk_size: int = 1024
+) -> list[int]:
+    """
+    Como `add_documents` para un iterable de longitud desconocida: un executemany
+    por trozo de `chunk_size` filas y un único commit (una sola transacción).
+    """
+    ids: list[int] = []
+    it = iter(texts)
+    while chunk := list(islice(it, chunk_size)):
+        ids.extend(_insert_chunk(db, chunk))
     db.commit()
-
-    # 4. Devolver los IDs de los documentos recién creados
-    return [doc.id for doc in doc_objects]
+    return ids
 
 
 # ------------------ History (bonus) ------------------ #
 def add_history(db: Session, question: str, answer: str, source_ids=None):
-    from src.infrastructure.persistence.sqlalchemy.models import QaHistory
-
-    history = QaHistory(
-        question=question,
-        answer=answer,
-        source_ids=source_ids if source_ids is not None else None,
+    # INSERT de Core: una fila por /ask sin objeto ORM ni flush del unit of work;
+    # el esquema lo crea el lifespan al arrancar, aquí no se toca
+    db.execute(
+        insert(QaHistory).values(
+            question=question, answer=answer, source_ids=source_ids
+        )
     )
-    db.add(history)
     db.commit()
 
 
-def get_history(db: Session, limit: int = 10, offset: int = 0):
-    return (
-        db.query(QaHistory)
-        .order_by(QaHistory.created_at.desc(), QaHistory.id.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
+def get_history(
+    db: Session, limit: int = 10, offset: int = 0, before_id: int | None = None
+):
+    """
+    Más recientes primero. Con `before_id` (keyset) la consulta es un range-scan
+    sobre la PK (`WHERE id < :before_id ORDER BY id DESC`), a cualquier
+    profundidad; `offset` se mantiene por compatibilidad pero recorre y descarta filas.
+    """
+    # filas Core (acceso por atributo) en vez de objetos ORM: sin identity map
+    # ni estado por fila para una lectura que sólo se serializa
+    columns = (
+        QaHistory.id,
+        QaHistory.question,
+        QaHistory.answer,
+        QaHistory.created_at,
+        QaHistory.source_ids,
     )
+    # id autoincremental: mismo orden que created_at y usable como cursor
+    query = select(*columns).order_by(QaHistory.id.desc())
+    if before_id is not None:
+        query = query.where(QaHistory.id < before_id)
+    elif offset:
+        query = query.offset(offset)
+    return db.execute(query.limit(limit)).all()
 
 
 def save_qa_history(db: Session, question: str, answer: str, source_ids=None):
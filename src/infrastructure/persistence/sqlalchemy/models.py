@@ -1,4 +1,4 @@
-# src/infrastructure/persistence/models.py
+# src/infrastructure/persistence/sqlalchemy/models.py
 
 from sqlalchemy import Column, DateTime, Integer, Text, func
 from sqlalchemy.types import JSON  # <-- Nueva línea, si usas SQLite 3.9+
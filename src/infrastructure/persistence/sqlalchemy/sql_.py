@@ -1,7 +1,8 @@
-# src/adapters/storage/sql_crud.py
+# src/infrastructure/persistence/sqlalchemy/sql_.py
 
-from typing import Sequence
+from typing import Iterable, Sequence
 
+from sqlalchemy import select
 from sqlalchemy.orm import sessionmaker
 
 from src.core.domain.entities import Document as DomainDocument
@@ -9,16 +10,16 @@ from src.core.ports import DocumentRepoPort, QAHistoryPort
 from src.infrastructure.persistence.sqlalchemy.base import SessionLocal
 from src.infrastructure.persistence.sqlalchemy.crud import (
     add_documents,
+    add_documents_stream,
     save_qa_history,
 )
 from src.infrastructure.persistence.sqlalchemy.models import Document as DbDocument
 
-# src/infrastructure/persistence/sqlalchemy/sql_.py
-
 
 class SqlDocumentStorage(DocumentRepoPort):
-    def __init__(self, session_factory: sessionmaker = SessionLocal):
-        self._session_factory = session_factory
+    def __init__(self, session_factory: sessionmaker | None = None):
+        # default resuelto en construcción (no en definición) -> inyectable sin rebind
+        self._session_factory = session_factory or SessionLocal
 
     def store_documents(self, texts: Sequence[str]) -> Sequence[int]:
         session = self._session_factory()
@@ -27,19 +28,43 @@ class SqlDocumentStorage(DocumentRepoPort):
         finally:
             session.close()
 
+    def store_documents_stream(
+        self, texts: Iterable[str], chunk_size: int = 1024
+    ) -> Sequence[int]:
+        """Ingesta de un iterable (p.ej. el lector CSV) en una sola transacción."""
+        session = self._session_factory()
+        try:
+            return add_documents_stream(session, texts, chunk_size)
+        finally:
+            session.close()
+
     def get(self, ids: Sequence[int]) -> Sequence[DomainDocument]:
         session = self._session_factory()
         try:
-            db_docs = session.query(DbDocument).filter(DbDocument.id.in_(ids)).all()
-            return [DomainDocument(id=d.id, content=d.content) for d in db_docs]
+            rows = session.execute(
+                select(DbDocument.id, DbDocument.content).where(DbDocument.id.in_(ids))
+            )
+            return [DomainDocument(id=i, content=c) for i, c in rows]
         finally:
             session.close()
 
     def get_all_documents(self) -> Sequence[DomainDocument]:
         session = self._session_factory()
         try:
-            db_docs = session.query(DbDocument).order_by(DbDocument.id).all()
-            return [DomainDocument(id=d.id, content=d.content) for d in db_docs]
+            # sólo las dos columnas, como tuplas: sin instanciar objetos ORM ni
+            # pasar por el identity map (el corpus puede ser todo el CSV)
+            rows = session.execute(
+                select(DbDocument.id, DbDocument.content).order_by(DbDocument.id)
+            )
+            return [DomainDocument(id=i, content=c) for i, c in rows]
+        finally:
+            session.close()
+
+    def get_all_ids(self) -> Sequence[int]:
+        """Sólo los ids (el retriever denso no necesita el texto): PK, sin leer content."""
+        session = self._session_factory()
+        try:
+            return list(session.scalars(select(DbDocument.id).order_by(DbDocument.id)))
         finally:
             session.close()
 
@@ -47,8 +72,11 @@ class SqlDocumentStorage(DocumentRepoPort):
 
 
 class HistorySqlStorage(QAHistoryPort):
+    def __init__(self, session_factory: sessionmaker | None = None):
+        self._session_factory = session_factory or SessionLocal
+
     def save(self, q, a, source_ids):
-        session = SessionLocal()
+        session = self._session_factory()
         try:
             save_qa_history(session, q, a, source_ids=source_ids)
         finally:
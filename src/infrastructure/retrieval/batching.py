@@ -0,0 +1,102 @@
+# src/infrastructure/retrieval/batching.py
+
+"""
+Micro-batching de consultas concurrentes: las peticiones `/ask` en vuelo se
+agrupan en una sola llamada `batch_fn(queries, k)` (un embed + un search de FAISS)
+que corre en un hilo; cada una recibe su resultado por un future.
+"""
+
+import asyncio
+from typing import Callable, List, Sequence, Tuple
+
+from src.core.domain.entities import Document
+
+Hits = Tuple[Sequence[Document], Sequence[float]]
+
+
+class QueryBatcher:
+    def __init__(
+        self,
+        batch_fn: Callable[[List[str], int], List[Hits]],
+        window_ms: float = 0.0,
+        max_size: int = 64,
+    ):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    async def submit(self, query: str, k: int) -> Hits:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:  # cola y worker atados al loop en curso
+            self._cancel_worker()  # el del loop anterior no queda huérfano
+            self._loop, self._queue = loop, asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue))
+        future = loop.create_future()
+        await self._queue.put((query, k, future))
+        return await future
+
+    def _cancel_worker(self) -> None:
+        worker, loop = self._worker, self._loop
+        self._loop = self._queue = self._worker = None
+        if worker is None or worker.done() or loop.is_closed():
+            return
+        # el worker puede ser de otro loop (otro hilo): cancel() desde el suyo
+        loop.call_soon_threadsafe(worker.cancel)
+
+    async def aclose(self) -> None:
+        """Cancela el worker (shutdown del lifespan); las consultas en cola se cancelan."""
+        worker, loop = self._worker, self._loop
+        self._cancel_worker()
+        if worker is not None and loop is asyncio.get_running_loop():
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        batch: list = []
+        try:
+            while True:
+                batch = [await queue.get()]
+                # Sin ventana no se espera a nadie: se agrupa lo que se encoló mientras
+                # el lote anterior estaba en el hilo (batching adaptativo a la carga)
+                deadline = loop.time() + self.window
+                while len(batch) < self.max_size:
+                    if not queue.empty():
+                        batch.append(queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self._flush(batch)
+        finally:
+            # cancelado: ni el lote en curso ni lo encolado esperan para siempre
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            for _, _, future in batch:
+                if not future.done():
+                    future.cancel()
+
+    async def _flush(self, batch) -> None:
+        # k máximo del lote: los resultados van por rango, se recortan por consulta
+        k = max(item[1] for item in batch)
+        try:
+            results = await asyncio.to_thread(
+                self.batch_fn, [query for query, _, _ in batch], k
+            )
+        except Exception as err:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+            return
+        for (_, k_q, future), (docs, scores) in zip(batch, results):
+            if not future.done():
+                future.set_result((list(docs[:k_q]), list(scores[:k_q])))
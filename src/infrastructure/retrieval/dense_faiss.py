@@ -1,33 +1,74 @@
 # src/infrastructure/retrieval/dense_faiss.py
 
-from typing import Sequence, Tuple
+from typing import List, Sequence, Tuple
+
+import numpy as np
 
 from src.core.domain.entities import Document
 from src.core.ports import RetrieverPort
+from src.infrastructure.retrieval.batching import QueryBatcher
 
 
 class DenseFaissRetriever(RetrieverPort):
-    def __init__(self, embedder, faiss_index, doc_repo):
+    def __init__(
+        self,
+        embedder,
+        faiss_index,
+        doc_repo,
+        batch_window_ms: float = 0.0,
+        batch_max_size: int = 64,
+    ):
         self.embedder = embedder
         self.faiss_index = faiss_index
         self.doc_repo = doc_repo
+        # aretrieve concurrentes -> un único retrieve_batch
+        self._batcher = QueryBatcher(
+            self.retrieve_batch, window_ms=batch_window_ms, max_size=batch_max_size
+        )
+
+    def warm(self) -> None:
+        """Un forward del modelo y una búsqueda FAISS en frío, fuera de la petición."""
+        self.faiss_index.warm()
+        self.embedder.embed(["warm-up"])
+
+    async def aclose(self) -> None:
+        await self._batcher.aclose()
 
     def retrieve(
         self, query: str, k: int = 5
+    ) -> Tuple[Sequence[Document], Sequence[float]]:
+        return self.retrieve_batch([query], k)[0]
+
+    async def aretrieve(
+        self, query: str, k: int = 5
     ) -> Tuple[Sequence[Document], Sequence[float]]:
         if k <= 0:
             return [], []
-        q_vec = self.embedder.embed([query])[0]
-        idxs, scores = self.faiss_index.search(q_vec, k)
-        ids = [self.faiss_index.id_map[i] for i in idxs if i != -1]
-        docs = self.doc_repo.get(ids)
+        return await self._batcher.submit(query, k)
+
+    def retrieve_batch(
+        self, queries: Sequence[str], k: int = 5
+    ) -> List[Tuple[Sequence[Document], Sequence[float]]]:
+        """
+        N consultas con un solo embed, un solo search de FAISS y un solo SELECT:
+        el coste fijo por llamada se reparte entre todas.
+        """
+        if k <= 0 or not queries:
+            return [([], []) for _ in queries]
+        q_mat = self.embedder.embed(list(queries))
+        # el índice devuelve ids de BD directamente (IndexIDMap2)
+        hits, scores = self.faiss_index.search_batch(q_mat, k)
+        # filtrado de -1 y conversión a int/float en NumPy; tolist() sólo al final
+        valid = hits != -1
+        per_query = [
+            dict(zip(row_ids[mask].tolist(), row_scores[mask].tolist()))
+            for row_ids, row_scores, mask in zip(hits, scores, valid)
+        ]
+        wanted = np.unique(hits[valid]).tolist()
         # Cuidado: puede haber desfase si algún id no existe, así que cruzamos id con doc.
-        id_to_score = {
-            id_: score for id_, i, score in zip(ids, idxs, scores) if i != -1
-        }
-        final_docs, final_scores = [], []
-        for doc in docs:
-            if doc.id in id_to_score:
-                final_docs.append(doc)
-                final_scores.append(float(id_to_score[doc.id]))
-        return final_docs, final_scores
+        by_id = {doc.id: doc for doc in self.doc_repo.get(wanted)} if wanted else {}
+        results = []
+        for id_to_score in per_query:
+            docs = [by_id[id_] for id_ in id_to_score if id_ in by_id]
+            results.append((docs, [id_to_score[d.id] for d in docs]))
+        return results
@@ -1,11 +1,25 @@
-# src/infrastructure/retrieval/sparse_bm25.py
+# src/infrastructure/retrieval/hybrid.py
 
-from typing import Sequence, Tuple
+import asyncio
+from typing import List, Sequence, Tuple
+
+import numpy as np
 
 from src.core.domain.entities import Document
 from src.core.ports import RetrieverPort
 
 
+def _minmax(scores) -> np.ndarray:
+    """Min-max a [0,1]; mismo criterio que BM25 cuando todos los scores coinciden."""
+    arr = np.asarray(scores, dtype=np.float64)
+    if arr.size == 0:
+        return arr
+    lo, hi = arr.min(), arr.max()
+    if hi == lo:
+        return np.full(arr.size, 0.0 if hi == 0 else 1.0)
+    return (arr - lo) / (hi - lo)
+
+
 class HybridRetriever(RetrieverPort):
     def __init__(self, dense: RetrieverPort, sparse: RetrieverPort, alpha: float = 0.5):
         if not 0.0 <= alpha <= 1.0:
@@ -14,32 +28,80 @@ class HybridRetriever(RetrieverPort):
         self.sparse = sparse
         self.alpha = alpha
 
+    def warm(self) -> None:
+        warm = getattr(self.dense, "warm", None)
+        if warm is not None:
+            warm()
+
+    async def aclose(self) -> None:
+        aclose = getattr(self.dense, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
     def retrieve(
         self, query: str, k: int = 5
     ) -> Tuple[Sequence[Document], Sequence[float]]:
-        dense_docs, dense_scores = self.dense.retrieve(query, k)
-        sparse_docs, sparse_scores = self.sparse.retrieve(query, k)
-
-        # Creamos mappings id->doc, id->score
-        dense_map = {
-            doc.id: (doc, score) for doc, score in zip(dense_docs, dense_scores)
-        }
-        sparse_map = {
-            doc.id: (doc, score) for doc, score in zip(sparse_docs, sparse_scores)
-        }
-        # Unimos IDs
-        all_ids = set(dense_map) | set(sparse_map)
-        combined = []
-        for doc_id in all_ids:
-            d_score = dense_map.get(doc_id, (None, 0.0))[1]
-            s_score = sparse_map.get(doc_id, (None, 0.0))[1]
-            doc = (
-                dense_map.get(doc_id, (None,))[0] or sparse_map.get(doc_id, (None,))[0]
-            )
-            if doc:
-                score = (1 - self.alpha) * d_score + self.alpha * s_score
-                combined.append((doc, score))
-        # Ordenar por score descendente
-        combined = sorted(combined, key=lambda t: t[1], reverse=True)[:k]
-        docs, scores = zip(*combined) if combined else ([], [])
-        return list(docs), list(scores)
+        return self._fuse(
+            self.dense.retrieve(query, k), self.sparse.retrieve(query, k), k
+        )
+
+    def retrieve_batch(
+        self, queries: Sequence[str], k: int = 5
+    ) -> List[Tuple[Sequence[Document], Sequence[float]]]:
+        """
+        Parte densa en un único embed + search de FAISS (si el denso ofrece
+        retrieve_batch); BM25 por consulta, que ya es un producto disperso.
+        """
+        queries = list(queries)
+        dense_batch = getattr(self.dense, "retrieve_batch", None)
+        if dense_batch is not None:
+            dense_hits = dense_batch(queries, k)
+        else:
+            dense_hits = [self.dense.retrieve(q, k) for q in queries]
+        return [
+            self._fuse(dense_res, self.sparse.retrieve(q, k), k)
+            for q, dense_res in zip(queries, dense_hits)
+        ]
+
+    async def aretrieve(
+        self, query: str, k: int = 5
+    ) -> Tuple[Sequence[Document], Sequence[float]]:
+        """Denso (FAISS) y BM25 en paralelo en hilos: ambos sueltan el GIL en C."""
+        dense_aretrieve = getattr(self.dense, "aretrieve", None)
+        dense_res, sparse_res = await asyncio.gather(
+            (
+                dense_aretrieve(query, k)
+                if dense_aretrieve is not None
+                else asyncio.to_thread(self.dense.retrieve, query, k)
+            ),
+            asyncio.to_thread(self.sparse.retrieve, query, k),
+        )
+        return self._fuse(dense_res, sparse_res, k)
+
+    def _fuse(self, dense_res, sparse_res, k: int):
+        (dense_docs, dense_scores), (sparse_docs, sparse_scores) = dense_res, sparse_res
+        docs_by_id = {doc.id: doc for doc in (*sparse_docs, *dense_docs)}
+        if k <= 0 or not docs_by_id:
+            return [], []
+
+        # Fusión vectorizada: ids concatenados, agrupados con unique + bincount
+        ids = np.fromiter(
+            (d.id for d in (*dense_docs, *sparse_docs)),
+            dtype=np.int64,
+            count=len(dense_docs) + len(sparse_docs),
+        )
+        # coseno [-1,1] y BM25 a la misma escala antes de mezclar con alpha
+        weighted = np.concatenate(
+            [
+                (1 - self.alpha) * _minmax(dense_scores),
+                self.alpha * _minmax(sparse_scores),
+            ]
+        )
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        agg = np.bincount(inverse, weights=weighted)
+
+        # top-k en O(n) con argpartition; sólo se ordenan los k supervivientes
+        k = min(k, len(agg))
+        top = np.argpartition(-agg, k - 1)[:k]
+        top = top[np.argsort(-agg[top], kind="stable")]
+        return [docs_by_id[i] for i in unique_ids[top].tolist()], agg[top].tolist()
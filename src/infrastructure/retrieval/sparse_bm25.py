@@ -1,35 +1,192 @@
 # src/infrastructure/retrieval/sparse_bm25.py
 
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 from typing import Sequence, Tuple
 
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix
+
 from src.core.domain.entities import Document
 from src.core.ports import RetrieverPort
+from src.settings import settings
+from src.utils import strip_html
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+# súbela si cambian el tokenizador o las fórmulas: invalida las cachés en disco
+_CACHE_VERSION = "csr-bm25-v1"
+
+
+def _tokenize(text: str) -> Tuple[str, ...]:
+    """
+    Mismos tokens que `_TOKEN_RE` sobre `preprocess_text(text)` sin colapsar
+    espacios (ningún token los contiene): lower + findall, ambos en C.
+    """
+    text = strip_html(text.lower())
+    # tupla: valor inmutable y seguro de compartir entre llamadas cacheadas
+    return tuple(_TOKEN_RE.findall(text))
+
+
+def _tokenize_corpus(tokenize, documents) -> list:
+    """
+    Tokeniza el corpus; a partir de `bm25_parallel_min_docs` documentos reparte
+    el trabajo (CPU puro, atado al GIL) entre procesos. "spawn" y no fork: el
+    proceso padre puede tener hilos de torch/FAISS vivos.
+    """
+    min_docs = settings.bm25_parallel_min_docs
+    workers = min(os.cpu_count() or 1, 8)
+    if not min_docs or len(documents) < min_docs or workers < 2:
+        return [tokenize(d) for d in documents]
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as ex:
+        return list(ex.map(tokenize, documents, chunksize=512))
+
+
+def _corpus_key(documents) -> str:
+    """Digest del corpus (orden incluido) + versión: clave de la caché BM25."""
+    h = hashlib.blake2b(_CACHE_VERSION.encode(), digest_size=16)
+    for doc in documents:
+        h.update(doc.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class _CsrBM25:
+    """
+    BM25Okapi (mismas fórmulas y defaults que rank_bm25) sobre una matriz
+    documento×término con el peso de cada término ya calculado: puntuar una
+    consulta es un único producto disperso sobre las columnas de sus términos.
+    """
+
+    def __init__(self, corpus, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        vocab: dict[str, int] = {}
+        term_id = vocab.setdefault
+        # un id de término por token (un único bucle Python, sin Counter por doc);
+        # el recuento de tf lo hace SciPy al sumar duplicados (fila, término)
+        flat = np.fromiter(
+            (term_id(t, len(vocab)) for doc in corpus for t in doc), dtype=np.int64
+        )
+        n_docs = len(corpus)
+        doc_len = np.fromiter(map(len, corpus), dtype=np.int64, count=n_docs)
+        rows = np.repeat(np.arange(n_docs, dtype=np.int64), doc_len)
+        tf_matrix = csr_matrix(
+            (np.ones(len(flat)), (rows, flat)), shape=(n_docs, len(vocab))
+        )
+        tf_matrix.sum_duplicates()
+        tf, indices = tf_matrix.data, tf_matrix.indices
+        avgdl = doc_len.mean()
+        norm = np.repeat(k1 * (1 - b + b * doc_len / avgdl), np.diff(tf_matrix.indptr))
+        tf_matrix.data = tf * (k1 + 1) / (tf + norm)
+        # CSC: el slice por columnas (términos de la consulta) no recorre todo X
+        self.matrix = tf_matrix.tocsc()
+
+        df = np.bincount(indices, minlength=len(vocab))
+        idf = np.log(n_docs - df + 0.5) - np.log(df + 0.5)
+        # suelo epsilon·idf medio para términos presentes en más de la mitad
+        idf[idf < 0] = epsilon * idf.mean()
+        self.idf = idf
+        self.vocab = vocab
+
+    def get_scores(self, query) -> np.ndarray:
+        cols = [self.vocab[t] for t in query if t in self.vocab]
+        if not cols:
+            return np.zeros(self.matrix.shape[0])
+        # términos repetidos en la consulta suman, como en rank_bm25
+        uniq, reps = np.unique(cols, return_counts=True)
+        return self.matrix[:, uniq] @ (reps * self.idf[uniq])
+
+    def save(self, path: Path, key: str) -> None:
+        m = self.matrix
+        # tokens \w+ nunca contienen "\n": el vocabulario cabe en un único blob
+        vocab = np.frombuffer("\n".join(self.vocab).encode("utf-8"), dtype=np.uint8)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as f:  # file handle: np.savez no añade sufijo
+            np.savez(
+                f,
+                key=np.array(key),
+                data=m.data,
+                indices=m.indices,
+                indptr=m.indptr,
+                shape=np.array(m.shape),
+                idf=self.idf,
+                vocab=vocab,
+            )
+        os.replace(tmp, path)  # un lector concurrente nunca ve un .npz a medias
+
+    @classmethod
+    def load(cls, path: Path, key: str) -> "_CsrBM25 | None":
+        """Estructura grabada por `save` si su clave coincide; si no, None."""
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            if str(data["key"]) != key:
+                return None
+            bm25 = cls.__new__(cls)
+            bm25.matrix = csc_matrix(
+                (data["data"], data["indices"], data["indptr"]),
+                shape=tuple(data["shape"]),
+            )
+            bm25.idf = data["idf"]
+            text = data["vocab"].tobytes().decode("utf-8")
+        bm25.vocab = {t: i for i, t in enumerate(text.split("\n") if text else [])}
+        return bm25
 
 
 class SparseBM25Retriever(RetrieverPort):
-    def __init__(self, documents, doc_ids, doc_repo):
-        self.doc_ids = doc_ids
-        self.doc_repo = doc_repo
+    def __init__(self, documents, doc_ids, cache_path=None):
+        # array int64 contiguo: el gather de los top-k es un único take de NumPy
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        # textos alineados con doc_ids: los hits se construyen sin ir a SQL
+        self.documents = list(documents)
         self.bm25 = None
         self.corpus_is_empty = not documents
         if not self.corpus_is_empty:
-            tokenized_corpus = [self._tok(d) for d in documents]
-            if any(tokenized_corpus):
-                from rank_bm25 import BM25Okapi
-
-                self.bm25 = BM25Okapi(tokenized_corpus)
-            else:
-                self.corpus_is_empty = True
-        else:
-            self.corpus_is_empty = True
+            self.bm25 = self._build(self.documents, cache_path)
+            self.corpus_is_empty = self.bm25 is None
 
-    @staticmethod
-    def _tok(text: str):
-        import re
+    def _build(self, documents, cache_path) -> "_CsrBM25 | None":
+        """
+        Con `cache_path`, reutiliza la matriz BM25 grabada para este mismo corpus
+        (clave: digest del texto): reiniciar no vuelve a tokenizar.
+        """
+        path = Path(cache_path) if cache_path else None
+        key = _corpus_key(documents) if path is not None else ""
+        if path is not None:
+            try:
+                cached = _CsrBM25.load(path, key)
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile) as err:
+                # caché truncada/corrupta o de otro formato: se reconstruye, no se
+                # impide arrancar por un fichero regenerable
+                logger.warning("Ignoring unreadable BM25 cache %s: %s", path, err)
+                cached = None
+            if cached is not None:
+                logger.info(
+                    "Reusing BM25 matrix for %d docs from %s", len(documents), path
+                )
+                return cached
+        # corpus sin pasar por el LRU (que queda para las consultas)
+        tokenize = getattr(self._tok, "__wrapped__", self._tok)
+        tokenized_corpus = _tokenize_corpus(tokenize, documents)
+        if not any(tokenized_corpus):
+            return None
+        bm25 = _CsrBM25(tokenized_corpus)
+        if path is not None:
+            bm25.save(path, key)
+        return bm25
 
-        from src.utils import preprocess_text
-
-        return re.findall(r"\w+", preprocess_text(text))
+    # consultas: LRU sobre el tokenizador de módulo (que sigue siendo picklable)
+    _tok = staticmethod(lru_cache(maxsize=2048)(_tokenize))
 
     def retrieve(
         self, query: str, k: int = 5
@@ -39,32 +196,24 @@ class SparseBM25Retriever(RetrieverPort):
         query_tokens = self._tok(query)
         if not query_tokens:
             return [], []
-        doc_scores = self.bm25.get_scores(query_tokens)
-        num_docs_to_return = min(k, len(doc_scores))
-        top_indices = sorted(
-            range(len(doc_scores)), key=lambda i: doc_scores[i], reverse=True
-        )[:num_docs_to_return]
-        retrieved_ids = [self.doc_ids[i] for i in top_indices]
-        retrieved_scores_raw = [doc_scores[i] for i in top_indices]
-        # Normalizamos
-        if not retrieved_scores_raw:
+        doc_scores = np.asarray(self.bm25.get_scores(query_tokens), dtype=np.float64)
+        k = min(k, len(doc_scores))
+        if k <= 0:
             return [], []
-        min_score = min(retrieved_scores_raw)
-        max_score = max(retrieved_scores_raw)
-        if max_score == min_score:
-            normalized_scores = [0.0 if max_score == 0 else 1.0] * len(
-                retrieved_scores_raw
-            )
+        # top-k en O(N) con argpartition; sólo se ordenan los k supervivientes
+        top = np.argpartition(-doc_scores, k - 1)[:k]
+        top = top[np.argsort(-doc_scores[top], kind="stable")]
+        raw = doc_scores[top]
+        # Normalizamos (min-max sobre los k recuperados)
+        lo, hi = raw.min(), raw.max()
+        if hi == lo:
+            normalized = np.full(k, 0.0 if hi == 0 else 1.0)
         else:
-            normalized_scores = [
-                (s - min_score) / (max_score - min_score) for s in retrieved_scores_raw
-            ]
-        docs = self.doc_repo.get(retrieved_ids)
-        # Map id->score para match exacto con los docs (si hay desfase)
-        id_to_score = dict(zip(retrieved_ids, normalized_scores))
-        final_docs, final_scores = [], []
-        for doc in docs:
-            if doc.id in id_to_score:
-                final_docs.append(doc)
-                final_scores.append(float(id_to_score[doc.id]))
-        return final_docs, final_scores
+            normalized = (raw - lo) / (hi - lo)
+        retrieved_ids = np.take(self.doc_ids, top).tolist()
+        # mismo snapshot que el índice BM25: contenido por posición, sin SELECT
+        docs = [
+            Document(id=doc_id, content=self.documents[pos])
+            for doc_id, pos in zip(retrieved_ids, top.tolist())
+        ]
+        return docs, normalized.tolist()
@@ -37,3 +37,11 @@ class HistoryItem(BaseModel):
     answer: str
     created_at: str
     source_ids: List[int] = []
+
+
+class HistoryPage(BaseModel):
+    """Página de `/history`; `next_cursor` se pasa como `cursor` para la siguiente."""
+
+    items: List[HistoryItem]
+    next_cursor: Optional[int] = None
+    has_more: bool = False
@@ -21,28 +21,104 @@ class Settings(BaseSettings):
     # OPENAI
     openai_api_key: str | None = None
     openai_model: str = "gpt-3.5-turbo"
+    # endpoint de la API (proxy / compatible OpenAI); también lo sondea el health-check
+    openai_base_url: str = "https://api.openai.com/v1"
     # OPENAI sampling
     openai_temperature: float = 0.2
     openai_top_p: float = 1.0
     openai_max_tokens: int = 256
     openai_embedding_model: str = "text-embedding-3-small"  # embeddings
+    # inputs per /embeddings request (API max 2048)
+    openai_embedding_batch_size: int = 1024
     # OLLAMA
     ollama_enabled: bool = True
     ollama_model: str = "gemma3:4b"
     ollama_base_url: str = "http://localhost:11434"
     ollama_request_timeout: int = 90  # Timeout in seconds
+    # segundos que se reutiliza el resultado del health-check (Ollama y OpenAI)
+    ollama_health_ttl: float = 30.0
     # SENTENCE-TRANSFORMERS
     st_embedding_model: str = "all-MiniLM-L6-v2"
+    st_batch_size: int = 64  # texts per forward pass in encode()
+    # lote de la ingesta offline (build_index/bootstrap): sin latencia que cuidar,
+    # lotes grandes aprovechan mejor los GEMM del forward
+    st_ingest_batch_size: int = 256
+    # float32 | float16 (GPU only) | bfloat16 | auto (bf16 if the GPU supports it)
+    st_dtype: str = Field("float32", pattern="^(float32|float16|bfloat16|auto)$")
+    st_cache_folder: str | None = None  # None -> SENTENCE_TRANSFORMERS_HOME / HF cache
+    # True tras la 1ª descarga: sin round-trips al Hub
+    st_local_files_only: bool = False
+    # Hilos intra-op de torch en CPU; None -> default de torch (núcleos físicos).
+    # OMP_NUM_THREADS/MKL_NUM_THREADS deben fijarse en el entorno antes de importar torch.
+    st_num_threads: int | None = None
+    query_embedding_cache_size: int = 4096  # LRU de embeddings de consulta; 0 = off
+    # Caché semántica de respuestas (coseno >= threshold con una pregunta previa);
+    # 0 la desactiva. Ojo: tras re-ingestar, las respuestas cacheadas no se invalidan
+    answer_cache_size: int = 0
+    answer_cache_threshold: float = 0.95
+    # LRU exacto (pregunta, contextos) -> respuesta delante del LLM; 0 = off.
+    # Se recrea (vacío) con cada get_rag_service(force_reload=True)
+    generation_cache_size: int = 0
+    # Micro-batching de /ask concurrentes en modo denso: espera extra (ms) para llenar
+    # el lote; con 0 se agrupa sólo lo que ya está en cola (sin latencia añadida)
+    query_batch_window_ms: float = 0.0
+    query_batch_max_size: int = 64
+    # Caché SQLite persistente de embeddings (fp16); "" la desactiva
+    embed_cache_path: str = ""
+    embed_cache_max_entries: int = 1_000_000
     # PATHS
     index_path: str = "data/index.faiss"
-    id_map_path: str = "data/id_map.pkl"
+    id_map_path: str = "data/id_map.npy"  # sólo legacy: los ids ya viven en el índice
+    # Embeddings fp16 de la última ingesta (clave: digest CSV + modelo); "" lo desactiva
+    vectors_cache_path: str = "data/vectors.fp16.npz"
     faq_csv: str = "data/faq.csv"  # for boostrap.py
     sqlite_url: str = "sqlite:///./data/app.db"
+    # conexiones del pool del engine de la app (persistentes + extra bajo picos)
+    sqlite_pool_size: int = 10
+    sqlite_max_overflow: int = 20
     csv_has_header: bool = True
+    # textos por lote en bootstrap (SQL + embeddings + FAISS)
+    ingest_chunk_size: int = 1024
+    # FAISS
+    # "auto": Flat por debajo de faiss_ivf_threshold, IVF+PQ (o IVF+SQ si
+    # faiss_vector_dtype no es float32) por encima.
+    # Cualquier otro valor se pasa tal cual a faiss.index_factory (p.ej. "IVF256,PQ16x8").
+    faiss_index_factory: str = "auto"
+    faiss_ivf_threshold: int = 10_000
+    faiss_nprobe: int = 8
+    # IVF-PQ ("auto" o upgrade): 0 = nlist 4·sqrt(N) y M automático (<=16, divide a d)
+    faiss_ivf_nlist: int = 0
+    faiss_pq_m: int = 0
+    # bits por código PQ: 8 = 256 centroides por sub-vector (4 entrena con menos filas)
+    faiss_pq_nbits: int = 8
+    # Al cargar, un índice Flat con más vectores que esto se convierte a
+    # faiss_upgrade_to (HNSW o IVF-PQ) y se graba una vez (bajo lock); 0 = nunca
+    faiss_flat_threshold: int = 50_000
+    faiss_upgrade_to: str = Field("hnsw", pattern="^(hnsw|ivfpq)$")
+    faiss_hnsw_m: int = 32
+    faiss_hnsw_ef_search: int = 64
+    # IVF del servicio mapeado desde disco (sólo lectura) en vez de copiado al heap
+    faiss_mmap: bool = True
+    # índice del servicio en GPU (requiere faiss-gpu; si no hay, se queda en CPU);
+    # use_cuvs: kernels cuVS para IVF en builds de FAISS que los incluyan
+    faiss_use_gpu: bool = False
+    faiss_use_cuvs: bool = False
+    # hilos OpenMP de FAISS; None -> default de OMP
+    faiss_num_threads: int | None = None
+    # Almacenamiento de vectores en índices planos/HNSW/IVF:
+    # float16 -> SQfp16 (mitad de memoria), int8 -> SQ8 (una cuarta parte)
+    faiss_vector_dtype: str = Field("float32", pattern="^(float32|float16|int8)$")
+    # BM25: corpus a partir del cual se tokeniza en paralelo (procesos); 0 = nunca
+    bm25_parallel_min_docs: int = 50_000
+    # Matriz BM25 ya tokenizada (clave: digest del corpus); "" la desactiva
+    bm25_cache_path: str = "data/bm25_cache.npz"
+    # construir el servicio + búsqueda/embedding sintéticos en el arranque (sin pico
+    # en el primer /ask); False: todo se carga perezosamente con la primera pregunta
+    warmup_on_startup: bool = True
     # DB SETUP
-    auto_populate_db_on_startup: bool = (
-        True  # Para controlar si dependencies.py puebla la BBDD
-    )
+    # sólo modo sparse: siembra la BD vacía desde el CSV al crear el retriever
+    # (dense/hybrid necesitan vectores: scripts/build_index.py)
+    auto_populate_db_on_startup: bool = True
     # INDEX SETUP
     create_dense_index: bool = True
 
@@ -2,23 +2,81 @@
 Utils: light helpers - no external deps (nltk)
 """
 
+import csv
+import logging
 import re
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
 
 _HTML_TAG_RE = re.compile(r"<[^>]+>")
 
+CSV_DELIMITER = ";"
+READ_BUFFER = 1 << 20  # 1 MB por read(): menos syscalls en CSVs grandes
+
+logger = logging.getLogger(__name__)
+
+
+def strip_html(text: str) -> str:
+    """Quita etiquetas HTML; la regex sólo corre si hay algún "<" (lo raro)."""
+    return _HTML_TAG_RE.sub("", text) if "<" in text else text
+
 
 def preprocess_text(text: str) -> str:
     """
     Normalize texts texto:
     1. lowercase
     2. colapse whitespaces
+    3. strip HTML tags
     """
-    text = text.lower().strip()
-    text = re.sub(r"\s+", " ", text)
-    text = _HTML_TAG_RE.sub("", text)
-    return text
+    # split/join (C puro) equivale a strip + sub(\s+, " ")
+    return strip_html(" ".join(text.lower().split()))
 
 
 def get_corpus_and_ids(doc_repo):
     docs = doc_repo.get_all_documents()
     return [d.content for d in docs], [d.id for d in docs]
+
+
+def _log_skipped_row(i: int, row: list[str]) -> None:
+    # %-args: filas malas en CSVs grandes no formatean nada si WARNING está filtrado
+    logger.warning("Row %d skipped (len=%d): %s", i, len(row), row)
+
+
+def iter_csv_texts(
+    csv_path: Path,
+    has_header: bool = True,
+    on_skip: Callable[[int, list[str]], None] = _log_skipped_row,
+) -> Iterator[str]:
+    """
+    Genera un texto 'pregunta respuesta' por fila válida, sin cargar el CSV entero.
+    Las filas con menos de 2 columnas se saltan y se notifican a `on_skip(i, row)`.
+    """
+    # buffer de 1 MB en el fichero binario subyacente; abierto dentro del `with`
+    with open(csv_path, encoding="utf-8", newline="", buffering=READ_BUFFER) as fh:
+        reader = csv.reader(fh, delimiter=CSV_DELIMITER)
+        if has_header:
+            next(reader, None)
+        for i, row in enumerate(reader, 1):
+            try:
+                q, a, *_ = row  # un único unpack por fila en vez de len() + 2 índices
+            except ValueError:
+                on_skip(i, row)
+                continue
+            yield f"{q.strip()} {a.strip()}"
+
+
+@contextmanager
+def file_lock(path: str | Path) -> Iterator[None]:
+    """flock exclusivo entre procesos (workers de uvicorn) sobre el fichero `path`."""
+    try:
+        import fcntl
+    except ImportError:  # sin flock (Windows): un único proceso en desarrollo
+        yield
+        return
+    with open(path, "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
@@ -0,0 +1,19 @@
+# tests/conftest.py
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.infrastructure.persistence.sqlalchemy import sql_ as sql_mod
+from src.infrastructure.persistence.sqlalchemy.base import Base, make_engine
+
+
+@pytest.fixture
+def in_memory_sqlite(monkeypatch):
+    """SQLite en memoria como SessionLocal por defecto de los storages SQL."""
+    engine = make_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    monkeypatch.setattr(sql_mod, "SessionLocal", session_factory)
+    yield session_factory
+    engine.dispose()
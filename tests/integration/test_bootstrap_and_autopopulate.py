@@ -21,9 +21,12 @@ def test_bootstrap_ingests_data(tmp_path, monkeypatch, capsys):
             self.dim = 4  # igual a DummyEmbedder
             self.id_map = []
 
-        def add_to_index(self, ids, vecs):
+        def add_to_index(self, ids, vecs, flush=True):
             self.id_map.extend(ids)
 
+        def flush(self):
+            pass
+
         def search(self, q, k):
             return ([0], [0.0])
 
@@ -33,7 +36,7 @@ def test_bootstrap_ingests_data(tmp_path, monkeypatch, capsys):
     monkeypatch.setattr(settings, "st_embedding_model", "dummy-4", raising=False)
     monkeypatch.setattr(
         "src.infrastructure.embeddings.sentence_transformers.SentenceTransformerEmbedder",
-        lambda model_name=None: DummyEmbedder(),
+        lambda model_name=None, batch_size=None: DummyEmbedder(),
         raising=True,
     )
     monkeypatch.setattr(faiss_index_mod, "FaissIndex", DummyFaissIndex)
@@ -44,6 +47,7 @@ def test_bootstrap_ingests_data(tmp_path, monkeypatch, capsys):
         writer = csv.writer(fh, delimiter=";")
         writer.writerow(["Q", "A"])
         writer.writerow(["¿Qué es RAG?", "Es Retrieval-Augmented Generation."])
+        writer.writerow(["fila corta"])
 
     monkeypatch.setattr(settings, "faq_csv", str(csv_file), raising=False)
     monkeypatch.setattr(settings, "csv_has_header", True, raising=False)
@@ -53,6 +57,9 @@ def test_bootstrap_ingests_data(tmp_path, monkeypatch, capsys):
     monkeypatch.setattr(
         settings, "id_map_path", str(tmp_path / "id.pkl"), raising=False
     )
+    monkeypatch.setattr(
+        settings, "vectors_cache_path", str(tmp_path / "vec.npz"), raising=False
+    )
     monkeypatch.setattr(
         settings, "sqlite_url", f"sqlite:///{tmp_path}/app.db", raising=False
     )
@@ -73,8 +80,25 @@ def test_bootstrap_ingests_data(tmp_path, monkeypatch, capsys):
 
     captured = capsys.readouterr()
     assert "Ingested" in captured.out or "Ingerido" in captured.out
+    assert "[WARN] Row 2 skipped (len=1)" in captured.out
+
+    from sqlalchemy.orm import sessionmaker
 
+    from src.infrastructure.persistence.sqlalchemy.base import make_engine
     from src.infrastructure.persistence.sqlalchemy.sql_ import SqlDocumentStorage
 
-    docs = SqlDocumentStorage().get_all_documents()
+    session_factory = sessionmaker(bind=make_engine(settings.sqlite_url))
+    docs = SqlDocumentStorage(session_factory=session_factory).get_all_documents()
     assert len(docs) == 1 and "RAG" in docs[0].content
+
+
+def test_vector_cache_key_changes_with_st_dtype(tmp_path, monkeypatch):
+    import scripts.bootstrap as bootstrap
+
+    csv_file = tmp_path / "faq.csv"
+    csv_file.write_text("q;a\nHola;Mundo\n", encoding="utf-8")
+    monkeypatch.setattr(settings, "st_dtype", "float32", raising=False)
+    fp32 = bootstrap._csv_digest(csv_file)
+    assert bootstrap._csv_digest(csv_file) == fp32
+    monkeypatch.setattr(settings, "st_dtype", "float16", raising=False)
+    assert bootstrap._csv_digest(csv_file) != fp32
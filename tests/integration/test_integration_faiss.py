@@ -15,4 +15,4 @@ def test_faiss_index_add_and_search(tmp_path):
     idx2 = FaissIndex(index_path, id_map_path, dim=dim)
     q = vectors[0]
     idxs, dists = idx2.search(q, k=1)
-    assert idx2.id_map[idxs[0]] == ids[0]
+    assert idxs[0] == ids[0]  # search devuelve ids de BD
@@ -1,3 +1,5 @@
+import numpy as np
+
 from src.infrastructure.embeddings.sentence_transformers import (
     SentenceTransformerEmbedder,
 )
@@ -8,20 +10,13 @@ def test_embedder_returns_correct_shape_and_type():
     emb = SentenceTransformerEmbedder(model_name="all-MiniLM-L6-v2")
     vectors = emb.embed(texts)
 
-    # Debe devolver lista de misma longitud
-    assert isinstance(vectors, list)
-    assert len(vectors) == len(texts)
-
-    # Cada vector debe ser lista/tuple de floats de la dimensión esperada
-    dim = emb.dim
-    for vec in vectors:
-        assert hasattr(vec, "__len__")
-        assert len(vec) == dim
-        # y todos sus elementos son floats
-        assert all(isinstance(x, float) for x in vec)
+    # Debe devolver una matriz float32 (N, dim)
+    assert isinstance(vectors, np.ndarray)
+    assert vectors.dtype == np.float32
+    assert vectors.shape == (len(texts), emb.dim)
 
 
 def test_embed_empty_list_returns_empty():
     emb = SentenceTransformerEmbedder()
     out = emb.embed([])
-    assert out == []
+    assert out.shape == (0, emb.dim)
@@ -1,9 +1,10 @@
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 
-from src.infrastructure.persistence.sqlalchemy.base import Base
+from src.infrastructure.persistence.sqlalchemy.base import Base, make_engine
 from src.infrastructure.persistence.sqlalchemy.sql_ import SqlDocumentStorage
+from src.settings import settings
 
 
 @pytest.fixture(scope="function")
@@ -45,3 +46,24 @@ def test_add_and_get_documents(in_memory_db):
     all_docs = storage.get_all_documents()
     assert len(all_docs) == 3
     assert {d.content for d in all_docs} == set(texts)
+
+
+def test_make_engine_sets_sqlite_pragmas(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # NORMAL == 1
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA mmap_size")).scalar() == 268435456
+    engine.dispose()
+
+
+def test_pool_options_only_for_file_databases(tmp_path):
+    from src.infrastructure.persistence.sqlalchemy.base import _pool_options
+
+    assert _pool_options("sqlite://") == {}
+    assert _pool_options("sqlite:///:memory:") == {}
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    engine = make_engine(url, **_pool_options(url))
+    assert engine.pool.size() == settings.sqlite_pool_size
+    engine.dispose()
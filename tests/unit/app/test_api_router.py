@@ -0,0 +1,71 @@
+# tests/unit/app/test_api_router.py
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.app import api_router
+from src.app.dependencies import get_rag_service
+from src.core.domain.entities import Document
+
+
+class DummyRagSvc:
+    async def aask(self, question, top_k=3):
+        return {
+            "answer": f"eco:{question}",
+            "docs": [Document(id=7, content="Doc")],
+            "scores": [np.float32(0.5)],
+        }
+
+
+def make_client():
+    app = FastAPI()
+    app.include_router(api_router.router, prefix="/api")
+    app.dependency_overrides[get_rag_service] = lambda: DummyRagSvc()
+    return TestClient(app)
+
+
+def test_ask_returns_answer_and_sources():
+    resp = make_client().post("/api/ask", json={"question": "hola", "k": 1})
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "answer": "eco:hola",
+        "sources": [
+            {"document": {"id": 7, "content": "Doc", "metadata": None}, "score": 0.5}
+        ],
+    }
+
+
+def test_history_pages_with_cursor(in_memory_sqlite):
+    from src.infrastructure.persistence.sqlalchemy.base import get_db
+    from src.infrastructure.persistence.sqlalchemy.crud import save_qa_history
+
+    with in_memory_sqlite() as db:
+        for i in range(3):
+            save_qa_history(db, f"q{i}", f"a{i}", source_ids=[i])
+
+    def override_db():
+        with in_memory_sqlite() as db:
+            yield db
+
+    client = make_client()
+    client.app.dependency_overrides[get_db] = override_db
+
+    first = client.get("/api/history", params={"limit": 2}).json()
+    assert [item["question"] for item in first["items"]] == ["q2", "q1"]
+    assert first["has_more"] is True
+    assert first["items"][0]["source_ids"] == [2]
+
+    rest = client.get(
+        "/api/history", params={"limit": 2, "cursor": first["next_cursor"]}
+    ).json()
+    assert [item["question"] for item in rest["items"]] == ["q0"]
+    assert rest == {**rest, "has_more": False, "next_cursor": None}
+
+
+def test_ask_endpoints_expose_no_reload_parameter():
+    app = FastAPI()
+    app.include_router(api_router.router, prefix="/api")
+    schema = app.openapi()
+    for path in ("/api/ask", "/api/ask/stream"):
+        params = schema["paths"][path]["post"].get("parameters", [])
+        assert "force_reload" not in {p["name"] for p in params}
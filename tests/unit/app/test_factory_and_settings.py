@@ -20,6 +20,9 @@ class DummySqlDocumentStorage:
 
         return [Document(id=1, content="D1"), Document(id=2, content="D2")]
 
+    def get_all_ids(self):
+        return [1, 2]
+
 
 class DummySqlDocumentStorageV2:
     def get_all_documents(self):
@@ -54,6 +57,46 @@ def test_get_generator_no_llm_configured(monkeypatch):
         factory.get_generator()
 
 
+def test_get_generator_probes_backends_once_and_falls_back(monkeypatch):
+    import httpx
+
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200 if request.url.path.endswith("/models") else 503)
+
+    reload_factory()
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(factory, "_http_client", lambda: client)
+    monkeypatch.setattr(settings, "ollama_enabled", True, raising=False)
+    monkeypatch.setattr(settings, "openai_api_key", "KEY", raising=False)
+    monkeypatch.setattr(
+        settings, "openai_base_url", "http://proxy.local/v1/", raising=False
+    )
+
+    assert factory.get_generator().__class__.__name__ == "OpenAIGenerator"
+    assert factory.get_generator().__class__.__name__ == "OpenAIGenerator"
+    # un sondeo por backend; el segundo get_generator usa la caché (TTL)
+    assert sorted(calls) == ["/api/tags", "/v1/models"]
+
+    factory.reset_rag_service()  # el reset descarta los sondeos cacheados
+    factory.get_generator()
+    assert len(calls) == 4
+
+
+def test_get_generator_keeps_ollama_when_no_backend_answers(monkeypatch):
+    import httpx
+
+    reload_factory()
+    client = httpx.Client(transport=httpx.MockTransport(lambda r: httpx.Response(503)))
+    monkeypatch.setattr(factory, "_http_client", lambda: client)
+    monkeypatch.setattr(settings, "ollama_enabled", True, raising=False)
+    monkeypatch.setattr(settings, "openai_api_key", "KEY", raising=False)
+
+    assert factory.get_generator().__class__.__name__ == "OllamaGenerator"
+
+
 @pytest.mark.parametrize(
     "mode,patched_class_name",
     [
@@ -78,10 +121,220 @@ def test_get_retriever_selects_correct_class(monkeypatch, mode, patched_class_na
 
 
 def test_get_retriever_invalid_mode(monkeypatch):
+    reload_factory()  # antes de parchear: el reload descartaría el parche
     monkeypatch.setattr(
         factory, "SqlDocumentStorage", lambda: DummySqlDocumentStorage(), raising=True
     )
     monkeypatch.setattr(settings, "retrieval_mode", "unknown", raising=False)
-    reload_factory()
     with pytest.raises(ValueError, match="Unsupported retrieval_mode"):
         factory.get_retriever()
+
+
+def test_dense_components_loaded_once_per_process(monkeypatch, tmp_path):
+    reload_factory()
+    loads = []
+
+    class DummyEmbedder:
+        dim = 4
+
+        def __init__(self, model_name=None):
+            loads.append(model_name)
+
+    monkeypatch.setattr(
+        "src.infrastructure.embeddings.sentence_transformers.SentenceTransformerEmbedder",
+        DummyEmbedder,
+    )
+    monkeypatch.setattr(factory, "SqlDocumentStorage", DummySqlDocumentStorage)
+    monkeypatch.setattr(settings, "retrieval_mode", "dense", raising=False)
+    monkeypatch.setattr(settings, "index_path", str(tmp_path / "i.faiss"))
+    monkeypatch.setattr(settings, "id_map_path", str(tmp_path / "i.npy"))
+
+    first = factory.get_retriever()
+    second = factory.get_retriever()
+    assert loads == [settings.st_embedding_model]
+    assert second.embedder is first.embedder
+    assert second.faiss_index is first.faiss_index
+
+
+def test_check_faiss_sql_consistency_reports_id_differences(caplog):
+    import numpy as np
+
+    class FakeIndex:
+        id_map = np.array([1, 2, 4], dtype=np.int64)
+
+    with caplog.at_level("WARNING"):
+        factory.check_faiss_sql_consistency([1, 2, 3], FakeIndex())
+    assert "SQL: {3}, FAISS: {4}" in caplog.text
+
+    caplog.clear()
+    with caplog.at_level("WARNING"):
+        factory.check_faiss_sql_consistency([2, 1], FakeIndex())
+    assert "count mismatch" in caplog.text and "id mismatch" in caplog.text
+
+    caplog.clear()
+    factory.check_faiss_sql_consistency([4, 1, 2], FakeIndex())
+    assert caplog.text == ""
+
+
+def test_load_corpus_seeds_empty_db_without_second_select(monkeypatch, tmp_path):
+    csv_path = tmp_path / "faq.csv"
+    csv_path.write_text("q;a\nHola;Mundo\nmala\nAdiós;Amigo\n", encoding="utf-8")
+    monkeypatch.setattr(settings, "faq_csv", str(csv_path), raising=False)
+    monkeypatch.setattr(settings, "csv_has_header", True, raising=False)
+    monkeypatch.setattr(settings, "auto_populate_db_on_startup", True, raising=False)
+    monkeypatch.setattr(settings, "retrieval_mode", "sparse", raising=False)
+
+    class EmptyRepo:
+        selects = 0
+
+        def get_all_documents(self):
+            self.selects += 1
+            return []
+
+        def get_all_ids(self):
+            return []
+
+        def store_documents_stream(self, texts, chunk_size=1024):
+            return [10 + i for i, _ in enumerate(texts)]
+
+    repo = EmptyRepo()
+    corpus, ids = factory._load_corpus(repo)
+    assert corpus == ["Hola Mundo", "Adiós Amigo"]
+    assert ids == [10, 11]
+    assert repo.selects == 1
+
+    # dense/hybrid no siembran: las filas quedarían sin vector en FAISS
+    def no_seed(texts, chunk_size=1024):
+        raise AssertionError("dense/hybrid must not seed the DB")
+
+    repo.store_documents_stream = no_seed
+    for mode in ("dense", "hybrid"):
+        monkeypatch.setattr(settings, "retrieval_mode", mode, raising=False)
+        assert factory._load_corpus(repo) == ([], [])
+
+
+def test_load_corpus_seeds_once_across_concurrent_workers(monkeypatch, tmp_path):
+    import threading
+    import time
+    from types import SimpleNamespace
+
+    csv_path = tmp_path / "faq.csv"
+    csv_path.write_text("q;a\nHola;Mundo\n", encoding="utf-8")
+    monkeypatch.setattr(settings, "faq_csv", str(csv_path), raising=False)
+    monkeypatch.setattr(settings, "csv_has_header", True, raising=False)
+    monkeypatch.setattr(settings, "auto_populate_db_on_startup", True, raising=False)
+    monkeypatch.setattr(settings, "retrieval_mode", "sparse", raising=False)
+    monkeypatch.setattr(
+        settings, "sqlite_url", f"sqlite:///{tmp_path}/app.db", raising=False
+    )
+
+    class SharedRepo:  # la misma tabla vista por varios workers
+        rows: list = []
+
+        def get_all_documents(self):
+            return [SimpleNamespace(id=i, content=t) for i, t in self.rows]
+
+        def store_documents_stream(self, texts, chunk_size=1024):
+            time.sleep(0.05)  # ventana de carrera entre SELECT vacío e INSERT
+            new = [(len(self.rows) + i, t) for i, t in enumerate(texts)]
+            self.rows.extend(new)
+            return [i for i, _ in new]
+
+    results = []
+    workers = [
+        threading.Thread(
+            target=lambda: results.append(factory._load_corpus(SharedRepo()))
+        )
+        for _ in range(4)
+    ]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    assert SharedRepo.rows == [(0, "Hola Mundo")]
+    assert all(r == (["Hola Mundo"], [0]) for r in results)
+
+
+def test_factory_import_does_not_load_sentence_transformers():
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, src.app.factory; "
+        "sys.exit('src.infrastructure.embeddings.sentence_transformers' in sys.modules)"
+    )
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
+
+
+def test_get_rag_service_builds_once_under_concurrency(monkeypatch):
+    import threading
+    import time
+
+    reload_factory()
+    builds = []
+
+    def slow_retriever():
+        builds.append(1)
+        time.sleep(0.05)
+        return object()
+
+    monkeypatch.setattr(factory, "get_retriever", slow_retriever)
+    monkeypatch.setattr(factory, "get_generator", lambda: object())
+    monkeypatch.setattr(factory, "HistorySqlStorage", lambda: object())
+    monkeypatch.setattr(factory, "_answer_cache", lambda: None)
+
+    services = []
+    threads = [
+        threading.Thread(target=lambda: services.append(factory.get_rag_service()))
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert builds == [1]
+    assert all(s is services[0] for s in services)
+    factory.reset_rag_service()
+
+
+def test_get_rag_service_wraps_generator_only_when_cache_enabled(monkeypatch):
+    from src.infrastructure.llms.cached import CachingGenerator
+
+    reload_factory()
+    monkeypatch.setattr(factory, "get_retriever", lambda: object())
+    monkeypatch.setattr(factory, "get_generator", lambda: "GEN")
+    monkeypatch.setattr(factory, "HistorySqlStorage", lambda: object())
+    monkeypatch.setattr(factory, "_answer_cache", lambda: None)
+
+    monkeypatch.setattr(settings, "generation_cache_size", 0, raising=False)
+    assert factory.get_rag_service(force_reload=True).generator == "GEN"
+
+    monkeypatch.setattr(settings, "generation_cache_size", 8, raising=False)
+    generator = factory.get_rag_service(force_reload=True).generator
+    assert isinstance(generator, CachingGenerator) and generator.inner == "GEN"
+    factory.reset_rag_service()
+
+
+def test_aclose_rag_service_closes_the_wrapped_generator(monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+
+    from src.infrastructure.llms.cached import CachingGenerator
+
+    closed = []
+
+    class ClosingGenerator:
+        def generate(self, question, contexts):
+            return "a"
+
+        async def aclose(self):
+            closed.append(True)
+
+    monkeypatch.setattr(factory, "_rag_service", None)
+    asyncio.run(factory.aclose_rag_service())  # sin servicio: no-op
+    service = SimpleNamespace(
+        generator=CachingGenerator(ClosingGenerator()), retriever=object()
+    )
+    monkeypatch.setattr(factory, "_rag_service", service)
+    asyncio.run(factory.aclose_rag_service())
+    assert closed == [True]
@@ -127,3 +127,41 @@ def test_etl_handles_duplicates():
     # Debe devolver 3 ids distintos (aunque textos repetidos)
     assert len(set(ids)) == 3
     assert [t for (_, t) in doc_repo.saved] == texts
+
+
+def test_etl_ingest_stream_chunks_input():
+    doc_repo = DummyDocRepo()
+    embedder = DummyEmbedder()
+    vector_repo = DummyVectorRepo()
+    etl = ETLService(doc_repo, vector_repo, embedder)
+    texts = (f"T{i}" for i in range(5))  # generador: no se materializa entero
+    ids = etl.ingest_stream(texts, chunk_size=2)
+    assert ids == [1, 2, 3, 4, 5]
+    assert embedder.calls == [["T0", "T1"], ["T2", "T3"], ["T4"]]
+    assert [u[0] for u in vector_repo.upserts] == [[1, 2], [3, 4], [5]]
+
+
+def test_etl_ingest_stream_defers_vector_store_writes_to_one_flush():
+    class FlushingVectorRepo(DummyVectorRepo):
+        flushes = 0
+
+        def upsert(self, ids, embeddings, flush=True):
+            assert flush is False
+            super().upsert(ids, embeddings)
+
+        def flush(self):
+            self.flushes += 1
+
+    vector_repo = FlushingVectorRepo()
+    etl = ETLService(DummyDocRepo(), vector_repo, DummyEmbedder())
+    etl.ingest_stream((f"T{i}" for i in range(5)), chunk_size=2)
+    assert len(vector_repo.upserts) == 3 and vector_repo.flushes == 1
+
+    # a mitad de ingesta: lo ya añadido se graba igualmente
+    def failing_texts():
+        yield "ok"
+        raise RuntimeError("csv roto")
+
+    with pytest.raises(RuntimeError, match="csv roto"):
+        etl.ingest_stream(failing_texts(), chunk_size=1)
+    assert vector_repo.flushes == 2
@@ -55,3 +55,143 @@ def test_rag_service_empty_docs():
     assert resp["answer"].startswith("No hay documentos indexados")
     assert resp["docs"] == []
     assert resp["scores"] == []
+
+
+def test_rag_service_aask_matches_ask():
+    import asyncio
+
+    doc = Document(id=1, content="contenido relevante")
+    history = DummyHistory()
+    rag = RagService(DummyRetriever([doc], [0.85]), DummyGenerator(), history)
+
+    resp = asyncio.run(rag.aask("¿Qué es esto?", top_k=1))
+    assert resp["docs"] == [doc] and resp["scores"] == [0.85]
+    assert resp["answer"] == "dummy-answer-for:¿Qué es esto?"
+    assert history.saved == [("¿Qué es esto?", resp["answer"], [1])]
+
+    empty = RagService(DummyRetriever([], []), DummyGenerator(), DummyHistory())
+    assert asyncio.run(empty.aask("vacío"))["docs"] == []
+
+
+def test_rag_service_astream_sources_then_tokens():
+    import asyncio
+
+    class StreamingGenerator(DummyGenerator):
+        async def astream(self, question, contexts):
+            for part in ("hola ", "mundo"):
+                yield part
+
+    async def collect(rag, question):
+        return [event async for event in rag.astream(question, top_k=1)]
+
+    doc = Document(id=1, content="contenido relevante")
+    history = DummyHistory()
+    rag = RagService(DummyRetriever([doc], [0.85]), StreamingGenerator(), history)
+    events = asyncio.run(collect(rag, "q"))
+    assert events == [
+        ("sources", ([doc], [0.85])),
+        ("token", "hola "),
+        ("token", "mundo"),
+    ]
+    assert history.saved == [("q", "hola mundo", [1])]
+
+    # sin astream: la respuesta completa en un único fragmento
+    rag = RagService(DummyRetriever([doc], [0.85]), DummyGenerator(), DummyHistory())
+    assert asyncio.run(collect(rag, "q"))[1:] == [("token", "dummy-answer-for:q")]
+
+
+def test_rag_service_ask_batch_uses_retrieve_batch():
+    class BatchRetriever(DummyRetriever):
+        def retrieve_batch(self, queries, k=3):
+            self.batched = list(queries)
+            return [self.retrieve(q, k) if q != "nada" else ([], []) for q in queries]
+
+    doc = Document(id=1, content="contenido relevante")
+    retriever, history = BatchRetriever([doc], [0.85]), DummyHistory()
+    rag = RagService(retriever, DummyGenerator(), history)
+
+    out = rag.ask_batch(["uno", "nada"], top_k=1)
+    assert retriever.batched == ["uno", "nada"]
+    assert out[0]["answer"] == "dummy-answer-for:uno" and out[1]["docs"] == []
+    assert history.saved == [("uno", "dummy-answer-for:uno", [1])]
+
+
+def test_rag_service_aask_batch_generates_concurrently():
+    import asyncio
+
+    class SlowAsyncGenerator(DummyGenerator):
+        in_flight = peak = 0
+
+        async def agenerate(self, question, contexts):
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            return self.generate(question, contexts)
+
+    class SelectiveRetriever(DummyRetriever):
+        def retrieve(self, query, k=3):
+            return ([], []) if query == "nada" else super().retrieve(query, k)
+
+    doc = Document(id=1, content="contenido relevante")
+    generator, history = SlowAsyncGenerator(), DummyHistory()
+    rag = RagService(SelectiveRetriever([doc], [0.85]), generator, history)
+
+    out = asyncio.run(rag.aask_batch(["uno", "nada", "dos"], top_k=1))
+    assert [r["answer"] for r in out[::2]] == [
+        "dummy-answer-for:uno",
+        "dummy-answer-for:dos",
+    ]
+    assert out[1]["docs"] == [] and generator.peak == 2
+    assert [q for q, _, _ in history.saved] == ["uno", "dos"]
+
+
+class DictCache:
+    def __init__(self):
+        self.data = {}
+
+    def lookup(self, question, top_k):
+        return self.data.get((question.lower(), top_k))
+
+    def store(self, question, top_k, result):
+        self.data[(question.lower(), top_k)] = result
+
+
+def test_rag_service_answer_cache_skips_retrieval_and_llm():
+    doc = Document(id=1, content="contenido relevante")
+    generator, history = DummyGenerator(), DummyHistory()
+    rag = RagService(
+        DummyRetriever([doc], [0.85]), generator, history, answer_cache=DictCache()
+    )
+    first = rag.ask("Hola", top_k=1)
+    rag.retriever = None  # un acierto no debe tocar el retriever
+    assert rag.ask("hola", top_k=1) is first
+    assert len(generator.calls) == 1
+    assert [q for q, _, _ in history.saved] == ["Hola", "hola"]
+
+
+def test_rag_service_batches_use_answer_cache_like_ask():
+    import asyncio
+
+    class SelectiveRetriever(DummyRetriever):
+        def retrieve(self, query, k=3):
+            return ([], []) if query == "nada" else super().retrieve(query, k)
+
+    doc = Document(id=1, content="contenido relevante")
+    for run_batch in (
+        lambda rag, qs: rag.ask_batch(qs, top_k=1),
+        lambda rag, qs: asyncio.run(rag.aask_batch(qs, top_k=1)),
+    ):
+        generator, history, cache = DummyGenerator(), DummyHistory(), DictCache()
+        retriever = SelectiveRetriever([doc], [0.85])
+        rag = RagService(retriever, generator, history, answer_cache=cache)
+
+        first = run_batch(rag, ["Uno", "nada"])
+        # respuestas generadas -> caché (como ask); sin documentos no se guardan
+        assert list(cache.data) == [("uno", 1)]
+        assert rag.ask("uno", top_k=1) is first[0]
+
+        out = run_batch(rag, ["UNO", "dos"])
+        assert out[0] is first[0] and out[1]["answer"] == "dummy-answer-for:dos"
+        assert [q for q, _ in generator.calls] == ["Uno", "dos"]
+        assert [q for q, _, _ in history.saved] == ["Uno", "uno", "UNO", "dos"]
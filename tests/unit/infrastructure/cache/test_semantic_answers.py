@@ -0,0 +1,37 @@
+# tests/unit/infrastructure/cache/test_semantic_answers.py
+import numpy as np
+
+from src.infrastructure.cache.semantic_answers import SemanticAnswerCache
+
+
+class AxisEmbedder:
+    """Cada palabra conocida es un eje; "hola!" y "hola" caen en el mismo."""
+
+    dim = 3
+    axes = {"hola": 0, "adios": 1, "gracias": 2}
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            out[row, self.axes[text.strip("!?¿¡ ")]] = 2.0  # sin normalizar
+        return out
+
+
+def test_hit_miss_and_top_k_must_match():
+    cache = SemanticAnswerCache(AxisEmbedder(), threshold=0.95, maxsize=4)
+    assert cache.lookup("hola", 3) is None
+    cache.store("hola", 3, {"answer": "A"})
+    assert cache.lookup("¡hola!", 3) == {"answer": "A"}
+    assert cache.lookup("hola", 5) is None  # otro top_k: otra respuesta
+    assert cache.lookup("adios", 3) is None
+
+
+def test_evicts_least_recently_used():
+    cache = SemanticAnswerCache(AxisEmbedder(), maxsize=2)
+    cache.store("hola", 3, {"answer": "H"})
+    cache.store("adios", 3, {"answer": "A"})
+    cache.lookup("hola", 3)  # "adios" pasa a ser el menos usado
+    cache.store("gracias", 3, {"answer": "G"})
+    assert cache.lookup("adios", 3) is None
+    assert cache.lookup("hola", 3) == {"answer": "H"}
+    assert cache.lookup("gracias", 3) == {"answer": "G"}
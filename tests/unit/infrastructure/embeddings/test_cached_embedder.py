@@ -0,0 +1,41 @@
+# tests/unit/infrastructure/embeddings/test_cached_embedder.py
+
+import numpy as np
+
+from src.infrastructure.embeddings.cached import CachingEmbedder
+
+
+class CountingEmbedder:
+    dim = 2
+
+    def __init__(self):
+        self.seen = []
+
+    def embed(self, texts):
+        self.seen.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_caching_embedder_only_embeds_misses_once():
+    inner = CountingEmbedder()
+    emb = CachingEmbedder(inner, maxsize=10)
+
+    first = emb.embed(["hola", "que tal", "hola"])
+    assert inner.seen == [["hola", "que tal"]]  # repetido en el lote: una vez
+    assert first.dtype == np.float32 and first.shape == (3, 2)
+    assert first[:, 0].tolist() == [4, 7, 4]
+
+    again = emb.embed(["  hola ", "adios"])  # clave normalizada por espacios
+    assert inner.seen[-1] == ["adios"]
+    assert again[:, 0].tolist() == [4, 5]
+
+
+def test_caching_embedder_evicts_least_recently_used():
+    inner = CountingEmbedder()
+    emb = CachingEmbedder(inner, maxsize=2)
+    emb.embed(["a"])
+    emb.embed(["bb"])
+    emb.embed(["a"])  # "a" pasa a ser el más reciente
+    emb.embed(["ccc"])  # expulsa "bb"
+    emb.embed(["a", "bb"])
+    assert inner.seen[-1] == ["bb"]
@@ -0,0 +1,60 @@
+# tests/unit/infrastructure/embeddings/test_disk_cached_embedder.py
+
+import numpy as np
+
+from src.infrastructure.embeddings.cached import DiskCachingEmbedder
+
+
+class CountingEmbedder:
+    dim = 3
+
+    def __init__(self):
+        self.seen = []
+
+    def embed(self, texts):
+        self.seen.append(list(texts))
+        return np.array([[len(t), 0.25, -1.0] for t in texts], dtype=np.float32)
+
+
+def test_disk_cache_survives_restart_and_is_scoped_by_model(tmp_path):
+    path = tmp_path / "emb.db"
+    inner = CountingEmbedder()
+    first = DiskCachingEmbedder(inner, path, model_name="m1")
+    out = first.embed(["hola", "mundo", "hola"])
+    assert inner.seen == [["hola", "mundo"]]
+    assert out.dtype == np.float32 and out.shape == (3, 3)
+
+    # "reinicio": nueva instancia sobre el mismo fichero
+    again = DiskCachingEmbedder(inner, path, model_name="m1")
+    cached = again.embed(["mundo", "hola"])
+    assert len(inner.seen) == 1
+    np.testing.assert_allclose(cached, out[[1, 0]], atol=1e-3)
+
+    other_model = DiskCachingEmbedder(inner, path, model_name="m2")
+    other_model.embed(["hola"])
+    assert inner.seen[-1] == ["hola"]
+
+
+def test_disk_cache_drops_oldest_beyond_max_entries(tmp_path):
+    inner = CountingEmbedder()
+    emb = DiskCachingEmbedder(inner, tmp_path / "emb.db", model_name="m", max_entries=2)
+    emb.embed(["a", "bb"])
+    emb.embed(["ccc"])  # expulsa "a"
+    emb.embed(["bb", "ccc", "a"])
+    assert inner.seen[-1] == ["a"]
+
+
+def test_disk_cache_miss_and_hit_return_identical_vectors(tmp_path):
+    class ThirdsEmbedder:
+        dim = 2
+
+        def embed(self, texts):
+            return np.full(
+                (len(texts), 2), 1 / 3, dtype=np.float32
+            )  # no exacto en fp16
+
+    emb = DiskCachingEmbedder(ThirdsEmbedder(), tmp_path / "emb.db", model_name="m")
+    miss = emb.embed(["q"])
+    hit = emb.embed(["q"])
+    assert miss.dtype == hit.dtype == np.float32
+    np.testing.assert_array_equal(miss, hit)
@@ -0,0 +1,47 @@
+# tests/unit/infrastructure/embeddings/test_openai_embedder.py
+
+import numpy as np
+
+from src.infrastructure.embeddings.openai import OpenAIEmbedder
+from src.settings import settings
+
+
+def make_dummy_openai(calls):
+    class DummyEmbeddings:
+        def create(self, model, input):
+            calls.append(list(input))
+            data = [
+                type("Item", (), {"embedding": [float(len(t))] * 3})() for t in input
+            ]
+            return type("Resp", (), {"data": data})()
+
+    class DummyClient:
+        embeddings = DummyEmbeddings()
+
+    return lambda *a, **k: DummyClient()
+
+
+def test_embed_batches_requests(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        "src.infrastructure.embeddings.openai.OpenAI", make_dummy_openai(calls)
+    )
+    monkeypatch.setattr(settings, "openai_embedding_batch_size", 2, raising=False)
+    emb = OpenAIEmbedder()
+
+    # 3 columnas: no figura en _MODEL_DIM, la dimensión sale de la respuesta
+    out = emb.embed(["a", "bb", "ccc", "dddd", "eeeee"])
+
+    assert calls == [["a", "bb"], ["ccc", "dddd"], ["eeeee"]]
+    assert out.dtype == np.float32 and out.shape == (5, 3) and emb.dim == 3
+    assert out[:, 0].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_embed_empty_makes_no_request(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        "src.infrastructure.embeddings.openai.OpenAI", make_dummy_openai(calls)
+    )
+    emb = OpenAIEmbedder()
+    out = emb.embed([])
+    assert calls == [] and out.shape == (0, emb.dim)
@@ -0,0 +1,32 @@
+# tests/unit/infrastructure/embeddings/test_sentence_transformers_embedder.py
+
+from types import SimpleNamespace
+
+from src.infrastructure.embeddings import sentence_transformers as st_mod
+
+
+class FakeModel:
+    loads = 0
+    device = SimpleNamespace(type="cpu")
+
+    def __init__(self, model_name, **kwargs):
+        FakeModel.loads += 1
+
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+
+def test_embedders_of_same_model_share_weights(monkeypatch):
+    monkeypatch.setattr(st_mod, "SentenceTransformer", FakeModel)
+    monkeypatch.setattr(st_mod.settings, "st_dtype", "float32", raising=False)
+    st_mod._load_model.cache_clear()
+    try:
+        serving = st_mod.SentenceTransformerEmbedder("fake-model")
+        ingest = st_mod.SentenceTransformerEmbedder("fake-model", batch_size=256)
+        assert ingest.model is serving.model and FakeModel.loads == 1
+        assert (serving.batch_size, ingest.batch_size) == (
+            st_mod.settings.st_batch_size,
+            256,
+        )
+    finally:
+        st_mod._load_model.cache_clear()
@@ -0,0 +1,47 @@
+# tests/unit/infrastructure/embeddings/test_vector_cache.py
+
+import numpy as np
+
+from src.infrastructure.embeddings.vector_cache import Fp16VectorCache
+
+
+class CountingEmbedder:
+    dim = 3
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        return np.array([[len(t), 0.5, 1.0] for t in texts], dtype=np.float32)
+
+
+def test_vector_cache_replays_without_loading_model(tmp_path):
+    path = tmp_path / "vec.npz"
+    inner = CountingEmbedder()
+    first = Fp16VectorCache(lambda: inner, path, key="abc")
+    a = first.embed(["a", "bb"])
+    b = first.embed(["ccc"])
+    first.save()
+    assert path.exists() and inner.calls == 2
+
+    loads = []
+    replay = Fp16VectorCache(lambda: loads.append(1) or inner, path, key="abc")
+    assert replay.hit and replay.dim == 3
+    out = np.vstack([replay.embed(["a", "bb"]), replay.embed(["ccc"])])
+    assert out.dtype == np.float32
+    np.testing.assert_allclose(out, np.vstack([a, b]), atol=1e-3)
+    assert loads == [] and inner.calls == 2  # el modelo ni se cargó
+
+
+def test_vector_cache_key_mismatch_recomputes(tmp_path):
+    path = tmp_path / "vec.npz"
+    inner = CountingEmbedder()
+    cache = Fp16VectorCache(lambda: inner, path, key="v1")
+    cache.embed(["a"])
+    cache.save()
+
+    stale = Fp16VectorCache(lambda: inner, path, key="v2")
+    assert not stale.hit
+    stale.embed(["a"])
+    assert inner.calls == 2
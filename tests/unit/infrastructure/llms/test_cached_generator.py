@@ -0,0 +1,70 @@
+# tests/unit/infrastructure/llms/test_cached_generator.py
+
+import asyncio
+
+import pytest
+
+from src.infrastructure.llms.cached import CachingGenerator
+
+
+class CountingGenerator:
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, question, contexts):
+        self.calls.append((question, tuple(contexts)))
+        if question == "boom":
+            raise RuntimeError("LLM caído")
+        return f"{question}:{len(contexts)}"
+
+
+def test_caching_generator_reuses_answer_for_same_prompt():
+    inner = CountingGenerator()
+    gen = CachingGenerator(inner, maxsize=10)
+
+    assert gen.generate("q", ["a", "b"]) == "q:2"
+    assert gen.generate("q", ["a", "b"]) == "q:2"
+    assert len(inner.calls) == 1
+
+    gen.generate("q", ["a"])  # otros contextos: otra clave
+    gen.generate("q", ["ab"])  # sin colisión por concatenación
+    assert len(inner.calls) == 3
+
+    for _ in range(2):  # los errores no se cachean
+        with pytest.raises(RuntimeError):
+            gen.generate("boom", [])
+    assert len(inner.calls) == 5
+
+
+def test_caching_generator_evicts_least_recently_used():
+    inner = CountingGenerator()
+    gen = CachingGenerator(inner, maxsize=2)
+    gen.generate("a", [])
+    gen.generate("b", [])
+    gen.generate("a", [])  # "a" pasa a ser el más reciente
+    gen.generate("c", [])  # expulsa "b"
+    gen.generate("a", [])
+    gen.generate("b", [])
+    assert [q for q, _ in inner.calls] == ["a", "b", "c", "b"]
+
+
+def test_caching_generator_async_paths_share_the_cache():
+    class StreamingGenerator(CountingGenerator):
+        async def astream(self, question, contexts):
+            self.calls.append((question, tuple(contexts)))
+            for part in ("ho", "la"):
+                yield part
+
+    inner = StreamingGenerator()
+    gen = CachingGenerator(inner)
+
+    async def collect(question):
+        return [part async for part in gen.astream(question, ["ctx"])]
+
+    assert asyncio.run(collect("q")) == ["ho", "la"]
+    assert asyncio.run(collect("q")) == ["hola"]  # acierto: un único fragmento
+    assert asyncio.run(gen.agenerate("q", ["ctx"])) == "hola"
+    assert gen.generate("q", ["ctx"]) == "hola"
+    # sin agenerate en el inner: generate en un hilo, y queda cacheado
+    assert asyncio.run(gen.agenerate("otra", [])) == "otra:0"
+    assert len(inner.calls) == 2
@@ -4,7 +4,7 @@ import pytest
 import requests
 from fastapi import HTTPException
 
-from src.infrastructure.llms.ollama_chat import OllamaGenerator
+from src.infrastructure.llms.ollama_chat import OllamaGenerator, _shared_session
 
 
 # ---------------- helpers -------------------------------------------------- #
@@ -25,14 +25,14 @@ class _RespNoField(_RespOK):
 
 # ---------------- tests ---------------------------------------------------- #
 def test_generate_ok(monkeypatch):
-    monkeypatch.setattr("requests.post", lambda *a, **k: _RespOK())
+    monkeypatch.setattr(_shared_session(), "post", lambda *a, **k: _RespOK())
     gen = OllamaGenerator()
     out = gen.generate("q", ["ctx1"])
     assert out == "answer"
 
 
 def test_generate_missing_response(monkeypatch):
-    monkeypatch.setattr("requests.post", lambda *a, **k: _RespNoField())
+    monkeypatch.setattr(_shared_session(), "post", lambda *a, **k: _RespNoField())
     gen = OllamaGenerator()
     with pytest.raises(HTTPException) as exc:
         gen.generate("q", ["ctx"])
@@ -43,8 +43,49 @@ def test_generate_timeout(monkeypatch):
     def _timeout(*_, **__):
         raise requests.exceptions.Timeout()
 
-    monkeypatch.setattr("requests.post", _timeout)
+    monkeypatch.setattr(_shared_session(), "post", _timeout)
     gen = OllamaGenerator()
     with pytest.raises(HTTPException) as exc:
         gen.generate("q", ["ctx"])
     assert exc.value.status_code == 504
+
+
+def test_agenerate_ok_and_http_error():
+    import asyncio
+
+    import httpx
+
+    def handler(request):
+        if b"boom" in request.content:
+            return httpx.Response(503, text="busy")
+        return httpx.Response(200, json={"response": " answer "})
+
+    gen = OllamaGenerator()
+    clients = []
+
+    def make_aclient():
+        clients.append(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        return clients[-1]
+
+    gen._make_aclient = make_aclient
+    assert asyncio.run(gen.agenerate("q", ["ctx"])) == "answer"
+    # nuevo event loop (otro asyncio.run): cliente nuevo, no el del loop cerrado
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(gen.agenerate("boom", ["ctx"]))
+    assert exc.value.status_code == 503 and len(clients) == 2
+
+    async def two_calls_then_close():
+        await gen.agenerate("q", ["ctx"])
+        await gen.agenerate("q", ["ctx"])
+        await gen.aclose()
+
+    asyncio.run(two_calls_then_close())
+    assert len(clients) == 3 and clients[-1].is_closed and gen._aclient is None
+
+
+def test_generate_reuses_one_pooled_session():
+    session = _shared_session()
+    assert _shared_session() is session
+    adapter = session.get_adapter("http://localhost:11434/api/generate")
+    assert adapter.max_retries.total == 2
+    assert "POST" in adapter.max_retries.allowed_methods
@@ -66,3 +66,82 @@ def test_generate_api_error(monkeypatch):
     with pytest.raises(HTTPException) as exc:
         gen.generate("fallará", ["ctx"])
     assert exc.value.status_code == 502
+
+
+def test_generators_share_one_http_pool(monkeypatch):
+    seen = []
+
+    def fake_openai(*a, **k):
+        seen.append(k.get("http_client"))
+        return make_dummy_openai()()
+
+    monkeypatch.setattr("src.infrastructure.llms.openai_chat.OpenAI", fake_openai)
+    OpenAIGenerator()
+    OpenAIGenerator()
+    assert seen[0] is not None and seen[0] is seen[1]
+
+
+def test_agenerate_uses_async_client(monkeypatch):
+    import asyncio
+
+    class DummyAsyncComp:
+        async def create(self, **kwargs):
+            self.kwargs = kwargs
+            msg = type("Cont", (), {"content": "ASYNC-OK"})()
+            return type("Resp", (), {"choices": [type("C", (), {"message": msg})()]})()
+
+    comp = DummyAsyncComp()
+    client = type("Client", (), {"chat": type("Chat", (), {"completions": comp})()})()
+    monkeypatch.setattr(
+        "src.infrastructure.llms.openai_chat.OpenAI", make_dummy_openai()
+    )
+    monkeypatch.setattr(
+        "src.infrastructure.llms.openai_chat.AsyncOpenAI", lambda *a, **k: client
+    )
+    gen = OpenAIGenerator()
+    assert asyncio.run(gen.agenerate("hola", ["ctx"])) == "ASYNC-OK"
+    system, user = comp.kwargs["messages"]
+    # prefijo estático primero (cacheable), pregunta y contextos al final
+    assert system["role"] == "system" and "ctx" not in system["content"]
+    assert user["content"].endswith("- ctx\n\nQUESTION: hola")
+
+
+def test_astream_yields_deltas(monkeypatch):
+    import asyncio
+
+    def chunk(text):
+        delta = type("D", (), {"content": text})()
+        return type("Chunk", (), {"choices": [type("C", (), {"delta": delta})()]})()
+
+    class DummyStream:
+        def __init__(self):
+            self._chunks = iter([chunk("Hola"), chunk(None), chunk(" mundo")])
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            try:
+                return next(self._chunks)
+            except StopIteration:
+                raise StopAsyncIteration from None
+
+    class DummyAsyncComp:
+        async def create(self, **kwargs):
+            assert kwargs["stream"] is True
+            return DummyStream()
+
+    client = type(
+        "Client", (), {"chat": type("Chat", (), {"completions": DummyAsyncComp()})()}
+    )()
+    monkeypatch.setattr(
+        "src.infrastructure.llms.openai_chat.OpenAI", make_dummy_openai()
+    )
+    monkeypatch.setattr(
+        "src.infrastructure.llms.openai_chat.AsyncOpenAI", lambda *a, **k: client
+    )
+
+    async def collect():
+        return [part async for part in OpenAIGenerator().astream("q", ["ctx"])]
+
+    assert asyncio.run(collect()) == ["Hola", " mundo"]
@@ -1,8 +1,11 @@
 # tests/test_faiss_index.py
+import faiss
 import numpy as np
+import pytest
 from pytest import approx
 
 from src.infrastructure.persistence.faiss.index import FaissIndex
+from src.settings import settings
 
 """
 Revisar locks si el proycto crece
@@ -16,8 +19,8 @@ def test_faiss_add_and_search(tmp_path):
 
     fi = FaissIndex(index_file, idmap_file, dim=dim)
 
-    # Creamos 5 vectores – el primero es claramente distinto (todo ceros)
-    vecs = [np.zeros(dim, dtype="float32")]
+    # Creamos 5 vectores – el primero es claramente distinto (eje negativo)
+    vecs = [np.array([-1.0, 0.0, 0.0, 0.0], dtype="float32")]
     vecs += [np.random.rand(dim).astype("float32") for _ in range(4)]
     ids = [10, 11, 12, 13, 14]
 
@@ -25,8 +28,351 @@ def test_faiss_add_and_search(tmp_path):
 
     idxs, dists = fi.search(vecs[0], k=3)
 
-    # El primer resultado debe ser el vector idéntico (distancia 0)
-    assert idxs[0] != -1
-    top_id = fi.id_map[idxs[0]]
-    assert top_id == 10
-    assert dists[0] == approx(0.0)
+    # El primer resultado debe ser el vector idéntico (similitud coseno 1);
+    # search devuelve directamente el id de BD
+    assert idxs[0] == 10
+    assert dists[0] == approx(1.0)
+
+
+def test_faiss_auto_factory_switches_to_ivf_pq(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "faiss_index_factory", "auto", raising=False)
+    monkeypatch.setattr(settings, "faiss_ivf_threshold", 10_000, raising=False)
+    fi = FaissIndex(tmp_path / "a.faiss", tmp_path / "a.pkl", dim=384)
+    assert fi._factory_string(500) == "Flat"
+    assert fi._factory_string(40_000) == "IVF800,PQ16x8"
+    monkeypatch.setattr(settings, "faiss_vector_dtype", "int8", raising=False)
+    assert fi._factory_string(40_000) == "IVF800,SQ8"
+    monkeypatch.setattr(settings, "faiss_vector_dtype", "float16", raising=False)
+    assert fi._factory_string(500) == "SQfp16"
+
+
+def test_faiss_float16_storage_uses_scalar_quantizer(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "faiss_index_factory", "auto", raising=False)
+    monkeypatch.setattr(settings, "faiss_vector_dtype", "float16", raising=False)
+    dim = 8
+    vecs = np.random.default_rng(1).random((20, dim), dtype=np.float32)
+
+    fi = FaissIndex(tmp_path / "sq.faiss", tmp_path / "sq.pkl", dim=dim)
+    fi.add_to_index(list(range(20)), vecs)
+
+    sq = faiss.downcast_index(fi.index.index)  # dentro del IDMap2
+    assert isinstance(sq, faiss.IndexScalarQuantizer)
+    assert sq.metric_type == faiss.METRIC_INNER_PRODUCT
+    idxs, scores = fi.search(vecs[3], k=1)
+    assert idxs[0] == 3
+    assert scores[0] == approx(1.0, abs=1e-3)
+
+
+def test_faiss_first_batch_trains_ivf_and_sets_nprobe(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "faiss_index_factory", "IVF16,Flat", raising=False)
+    monkeypatch.setattr(settings, "faiss_nprobe", 4, raising=False)
+    dim = 16
+    vecs = np.random.default_rng(0).random((400, dim), dtype=np.float32)
+    ids = list(range(1000, 1400))
+
+    fi = FaissIndex(tmp_path / "ivf.faiss", tmp_path / "id_map.pkl", dim=dim)
+    fi.add_to_index(ids, vecs)
+
+    ivf = faiss.extract_index_ivf(fi.index)
+    assert ivf.nlist == 16 and ivf.nprobe == 4
+    assert ivf.parallel_mode == 2
+    assert fi.index.ntotal == 400
+
+    # Recarga desde disco: mismo tipo y nprobe aplicado
+    fi2 = FaissIndex(tmp_path / "ivf.faiss", tmp_path / "id_map.pkl", dim=dim)
+    assert faiss.extract_index_ivf(fi2.index).nprobe == 4
+    assert faiss.extract_index_ivf(fi2.index).parallel_mode == 2
+    idxs, _ = fi2.search(vecs[0], k=5)
+    assert idxs[0] == 1000
+
+
+def test_faiss_ids_live_in_index_and_legacy_index_is_migrated(tmp_path):
+    import pickle
+
+    dim = 4
+    vecs = np.eye(dim, dtype=np.float32)
+    fi = FaissIndex(tmp_path / "i.faiss", tmp_path / "id_map.npy", dim=dim)
+    fi.add_to_index([7, 8, 9, 10], vecs)
+    assert not (tmp_path / "id_map.npy").exists()  # un único artefacto
+
+    reloaded = FaissIndex(tmp_path / "i.faiss", tmp_path / "id_map.npy", dim=dim)
+    assert reloaded.id_map.tolist() == [7, 8, 9, 10]
+
+    # Formato antiguo: índice posicional + id_map pickle aparte
+    legacy = faiss.IndexFlatIP(dim)
+    legacy.add(vecs)
+    faiss.write_index(legacy, str(tmp_path / "old.faiss"))
+    with (tmp_path / "old.pkl").open("wb") as f:
+        pickle.dump([7, 8, 9, 10], f)
+
+    with pytest.deprecated_call():
+        migrated = FaissIndex(tmp_path / "old.faiss", tmp_path / "old.pkl", dim=dim)
+    assert isinstance(migrated.index, faiss.IndexIDMap2)
+    assert migrated.id_map.tolist() == [7, 8, 9, 10]
+    ids, scores = migrated.search(vecs[2], k=1)
+    assert ids[0] == 9 and scores[0] == approx(1.0)
+
+    # la migración se grabó: el pickle ya no hace falta
+    (tmp_path / "old.pkl").unlink()
+    again = FaissIndex(tmp_path / "old.faiss", tmp_path / "old.pkl", dim=dim)
+    assert again.id_map.tolist() == [7, 8, 9, 10]
+
+
+def test_faiss_search_batch_one_call_for_many_queries(tmp_path):
+    dim = 4
+    vecs = np.eye(dim, dtype=np.float32)
+    fi = FaissIndex(tmp_path / "b.faiss", tmp_path / "b.npy", dim=dim)
+    fi.add_to_index([7, 8, 9, 10], vecs)
+
+    ids, scores = fi.search_batch(vecs[[3, 0]], k=10)  # k se recorta a ntotal
+    assert ids.shape == (2, 4) and scores.shape == (2, 4)
+    assert ids[:, 0].tolist() == [10, 7]
+
+    empty = FaissIndex(tmp_path / "e.faiss", tmp_path / "e.npy", dim=dim)
+    ids, scores = empty.search_batch(vecs[:2], k=3)
+    assert ids.shape == (2, 0)
+
+
+def test_large_flat_index_is_upgraded_to_hnsw_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "faiss_index_factory", "Flat", raising=False)
+    monkeypatch.setattr(settings, "faiss_flat_threshold", 50, raising=False)
+    dim = 8
+    vecs = np.random.default_rng(2).random((80, dim), dtype=np.float32)
+    fi = FaissIndex(tmp_path / "h.faiss", tmp_path / "h.npy", dim=dim)
+    fi.add_to_index(list(range(100, 180)), vecs)
+
+    up = FaissIndex(tmp_path / "h.faiss", tmp_path / "h.npy", dim=dim)
+    hnsw = faiss.downcast_index(up.index.index)
+    assert isinstance(hnsw, faiss.IndexHNSWFlat)
+    assert hnsw.hnsw.efSearch == settings.faiss_hnsw_ef_search
+    assert up.id_map.tolist() == list(range(100, 180))
+    assert up.search(vecs[5], k=1)[0][0] == 105
+
+    # el HNSW quedó grabado (sin flush): la siguiente carga no reconstruye
+    assert not up._dirty
+    monkeypatch.setattr(
+        FaissIndex, "_upgrade_index", lambda self: pytest.fail("rebuilt twice")
+    )
+    again = FaissIndex(tmp_path / "h.faiss", tmp_path / "h.npy", dim=dim)
+    assert isinstance(faiss.downcast_index(again.index.index), faiss.IndexHNSWFlat)
+
+
+def test_int8_dtype_uses_sq8_for_build_and_hnsw_upgrade(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "faiss_index_factory", "auto", raising=False)
+    monkeypatch.setattr(settings, "faiss_vector_dtype", "int8", raising=False)
+    dim = 8
+    vecs = np.random.default_rng(3).random((60, dim), dtype=np.float32)
+
+    fi = FaissIndex(tmp_path / "q.faiss", tmp_path / "q.npy", dim=dim)
+    fi.add_to_index(list(range(60)), vecs)
+    sq = faiss.downcast_index(fi.index.index)
+    assert sq.sq.qtype == faiss.ScalarQuantizer.QT_8bit
+    assert fi.search(vecs[4], k=1)[0][0] == 4
+
+    # Flat grande en disco + int8 -> HNSW sobre SQ8
+    flat = faiss.index_factory(dim, "IDMap2,Flat", faiss.METRIC_INNER_PRODUCT)
+    flat.add_with_ids(fi._prepare(vecs), np.arange(60, dtype=np.int64))
+    faiss.write_index(flat, str(tmp_path / "f.faiss"))
+    monkeypatch.setattr(settings, "faiss_flat_threshold", 50, raising=False)
+    up = FaissIndex(tmp_path / "f.faiss", tmp_path / "f.npy", dim=dim)
+    assert isinstance(faiss.downcast_index(up.index.index), faiss.IndexHNSWSQ)
+    assert up.search(vecs[9], k=1)[0][0] == 9
+
+
+def test_warm_runs_on_empty_and_filled_index(tmp_path):
+    fi = FaissIndex(tmp_path / "w.faiss", tmp_path / "w.npy", dim=4)
+    fi.warm()  # vacío: no-op
+    assert fi.index.ntotal == 0 and fi.search(np.ones(4), k=3)[0].size == 0
+
+    vecs = np.eye(4, dtype=np.float32)[:2]
+    fi.add_to_index([1, 2], vecs)
+    before = fi.search_batch(vecs, k=2)
+    fi.warm()
+    # sólo lee: mismo índice, mismos resultados
+    assert fi.index.ntotal == 2 and fi.id_map.tolist() == [1, 2]
+    after = fi.search_batch(vecs, k=2)
+    assert np.array_equal(after[0], before[0]) and np.allclose(after[1], before[1])
+    assert after[0][:, 0].tolist() == [1, 2]
+
+
+def test_large_flat_index_can_be_upgraded_to_ivf(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "faiss_ivf_nlist", 4, raising=False)
+    monkeypatch.setattr(settings, "faiss_pq_m", 2, raising=False)
+    assert FaissIndex._ivfpq_factory(10**6, 8) == "IVF4,PQ2x8"
+
+    monkeypatch.setattr(settings, "faiss_index_factory", "Flat", raising=False)
+    monkeypatch.setattr(settings, "faiss_flat_threshold", 100, raising=False)
+    monkeypatch.setattr(settings, "faiss_upgrade_to", "ivfpq", raising=False)
+    monkeypatch.setattr(settings, "faiss_nprobe", 4, raising=False)
+    # PQ real pero pequeño (d=8, IVF4,PQ2x4): 16 centroides por sub-vector,
+    # 700 filas de entrenamiento bastan y entrena en décimas de segundo
+    monkeypatch.setattr(settings, "faiss_pq_nbits", 4, raising=False)
+    dim = 8
+    vecs = np.random.default_rng(4).random((700, dim), dtype=np.float32)
+    fi = FaissIndex(tmp_path / "p.faiss", tmp_path / "p.npy", dim=dim)
+    fi.add_to_index(list(range(700)), vecs)
+
+    up = FaissIndex(tmp_path / "p.faiss", tmp_path / "p.npy", dim=dim)
+    ivf = faiss.extract_index_ivf(up.index)
+    assert ivf.nlist == 4 and ivf.nprobe == 4
+    pq = faiss.downcast_index(ivf)
+    assert isinstance(pq, faiss.IndexIVFPQ) and (pq.pq.M, pq.pq.nbits) == (2, 4)
+    assert up.index.ntotal == 700
+    assert 7 in up.search(vecs[7], k=5)[0]  # PQ es aproximado: top-5
+
+
+def test_mmap_maps_ivf_read_only_and_loads_flat_normally(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "faiss_index_factory", "IVF8,Flat", raising=False)
+    dim = 8
+    vecs = np.random.default_rng(1).random((200, dim), dtype=np.float32)
+    FaissIndex(tmp_path / "ivf.faiss", tmp_path / "m.npy", dim=dim).add_to_index(
+        list(range(200)), vecs
+    )
+
+    mapped = FaissIndex(tmp_path / "ivf.faiss", tmp_path / "m.npy", dim=dim, mmap=True)
+    assert mapped.read_only
+    assert mapped.search(vecs[7], k=1)[0][0] == 7
+    with pytest.raises(RuntimeError, match="read-only"):
+        mapped.add_to_index([999], vecs[:1])
+
+    monkeypatch.setattr(settings, "faiss_index_factory", "Flat", raising=False)
+    FaissIndex(tmp_path / "flat.faiss", tmp_path / "m.npy", dim=dim).add_to_index(
+        [1, 2], vecs[:2]
+    )
+    flat = FaissIndex(tmp_path / "flat.faiss", tmp_path / "m.npy", dim=dim, mmap=True)
+    assert not flat.read_only
+    flat.add_to_index([3], vecs[2:3])
+    assert flat.index.ntotal == 3
+    assert not (tmp_path / "flat.faiss.tmp").exists()
+
+
+def test_prepare_copies_only_when_normalizing(tmp_path, monkeypatch):
+    fi = FaissIndex(tmp_path / "p.faiss", tmp_path / "p.npy", dim=2)
+    vecs = np.array([[3.0, 4.0]], dtype=np.float32)
+
+    monkeypatch.setattr(FaissIndex, "is_cosine", property(lambda self: True))
+    assert fi._prepare(vecs) == approx(np.array([[0.6, 0.8]]))
+    assert vecs.tolist() == [[3.0, 4.0]]  # el array del llamador no se toca
+
+    monkeypatch.setattr(FaissIndex, "is_cosine", property(lambda self: False))
+    assert fi._prepare(vecs) is vecs
+    assert fi._prepare([[1, 2]]).dtype == np.float32
+
+
+def test_add_to_index_rejects_wrong_dimension(tmp_path):
+    fi = FaissIndex(tmp_path / "d.faiss", tmp_path / "d.npy", dim=4)
+    with pytest.raises(ValueError, match=r"\(N, 4\)"):
+        fi.add_to_index(np.array([1, 2]), np.ones((2, 3), dtype=np.float32))
+    fi.add_to_index(np.array([1, 2]), np.eye(2, 4, dtype=np.float32))
+    ids, _ = fi.search(np.eye(2, 4, dtype=np.float32)[1], k=1)
+    assert ids.tolist() == [2]
+
+
+def test_configured_hnsw_factory_is_tuned_on_first_add(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "faiss_index_factory", "HNSW8", raising=False)
+    fi = FaissIndex(tmp_path / "h.faiss", tmp_path / "h.npy", dim=4)
+    vecs = np.random.default_rng(0).random((20, 4), dtype=np.float32)
+    fi.add_to_index(np.arange(20), vecs)
+    hnsw = faiss.downcast_index(fi.index.index)
+    assert isinstance(hnsw, faiss.IndexHNSW)
+    assert hnsw.hnsw.efConstruction == 200
+    assert hnsw.hnsw.efSearch == settings.faiss_hnsw_ef_search
+
+
+def test_use_gpu_clones_loaded_index_or_falls_back_to_cpu(
+    tmp_path, monkeypatch, caplog
+):
+    import types
+
+    path, ids_path = tmp_path / "g.faiss", tmp_path / "g.npy"
+    FaissIndex(path, ids_path, dim=4).add_to_index(
+        np.arange(3), np.eye(3, 4, dtype=np.float32)
+    )
+    monkeypatch.setattr(settings, "faiss_use_gpu", True, raising=False)
+
+    # build sólo-CPU (el de este entorno): aviso y búsqueda en CPU
+    with caplog.at_level("WARNING"):
+        fi = FaissIndex(path, ids_path, dim=4)
+    assert not fi.on_gpu and "no FAISS GPU device" in caplog.text
+
+    cloned, saved = [], []
+    monkeypatch.setattr(faiss, "get_num_gpus", lambda: 1)
+    monkeypatch.setattr(
+        faiss, "GpuMultipleClonerOptions", types.SimpleNamespace, raising=False
+    )
+    monkeypatch.setattr(
+        faiss, "index_cpu_to_all_gpus", lambda idx, co: cloned.append(co) or idx
+    )
+    monkeypatch.setattr(
+        faiss, "index_gpu_to_cpu", lambda idx: saved.append(idx) or idx, raising=False
+    )
+    fi = FaissIndex(path, ids_path, dim=4)
+    assert fi.on_gpu and cloned[0].useFloat16
+    fi.save()
+    assert saved == [fi.index]  # se graba la copia CPU
+
+
+def test_add_to_index_without_flush_writes_once_on_flush(tmp_path):
+    path = tmp_path / "f.faiss"
+    fi = FaissIndex(path, tmp_path / "f.npy", dim=4)
+    for start in (0, 2):
+        fi.add_to_index(
+            np.arange(start, start + 2), np.eye(2, 4, dtype=np.float32), flush=False
+        )
+    assert not path.exists()
+    fi.flush()
+    assert faiss.read_index(str(path)).ntotal == 4
+    mtime = path.stat().st_mtime_ns
+    fi.flush()  # sin cambios pendientes: no reescribe
+    assert path.stat().st_mtime_ns == mtime
+
+
+def test_streamed_small_batches_still_build_ivf_past_threshold(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "faiss_index_factory", "auto", raising=False)
+    monkeypatch.setattr(settings, "faiss_ivf_threshold", 300, raising=False)
+    monkeypatch.setattr(settings, "faiss_ivf_nlist", 4, raising=False)
+    monkeypatch.setattr(settings, "faiss_vector_dtype", "int8", raising=False)
+    rng = np.random.default_rng(0)
+
+    def stream(fi, n, chunk=50):
+        # como ETLService.ingest_stream: lotes sin grabar y un flush al final
+        for start in range(0, n, chunk):
+            ids = np.arange(start, min(start + chunk, n))
+            fi.add_to_index(ids, rng.random((len(ids), 8), dtype=np.float32), False)
+        fi.flush()
+
+    stream(FaissIndex(tmp_path / "s.faiss", tmp_path / "s.npy", dim=8), 500)
+    index = faiss.read_index(str(tmp_path / "s.faiss"))
+    assert index.ntotal == 500
+    faiss.extract_index_ivf(index)  # IVF (no Flat), pese a lotes de 50 < umbral
+
+    # stream corto (por debajo del umbral): Flat, con todos los lotes
+    stream(FaissIndex(tmp_path / "f.faiss", tmp_path / "f.npy", dim=8), 120)
+    flat = faiss.read_index(str(tmp_path / "f.faiss"))
+    assert flat.ntotal == 120
+    assert isinstance(faiss.downcast_index(flat.index), faiss.IndexScalarQuantizer)
+
+
+def test_upgrade_stays_in_memory_when_index_dir_is_not_writable(tmp_path, monkeypatch):
+    from contextlib import contextmanager
+
+    from src.infrastructure.persistence.faiss import index as index_mod
+
+    monkeypatch.setattr(settings, "faiss_index_factory", "Flat", raising=False)
+    monkeypatch.setattr(settings, "faiss_flat_threshold", 50, raising=False)
+    vecs = np.random.default_rng(5).random((80, 8), dtype=np.float32)
+    FaissIndex(tmp_path / "r.faiss", tmp_path / "r.npy", dim=8).add_to_index(
+        list(range(80)), vecs
+    )
+
+    @contextmanager
+    def read_only_lock(path):
+        raise PermissionError(13, "Permission denied", str(path))
+        yield
+
+    monkeypatch.setattr(index_mod, "file_lock", read_only_lock)
+    up = FaissIndex(tmp_path / "r.faiss", tmp_path / "r.npy", dim=8)
+    assert isinstance(faiss.downcast_index(up.index.index), faiss.IndexHNSWFlat)
+    assert up.search(vecs[3], k=1)[0][0] == 3
+    on_disk = faiss.read_index(str(tmp_path / "r.faiss"))
+    assert isinstance(faiss.downcast_index(on_disk.index), faiss.IndexFlat)
@@ -16,3 +16,54 @@ def test_store_and_get_documents(in_memory_sqlite):
     docs = storage.get(ids)
     contents = sorted(d.content for d in docs)
     assert contents == sorted(texts)
+    assert storage.get_all_ids() == sorted(ids)
+
+
+def test_get_history_keyset_pages_newest_first(in_memory_sqlite):
+    from src.infrastructure.persistence.sqlalchemy.crud import add_history, get_history
+
+    with in_memory_sqlite() as db:
+        for i in range(5):
+            add_history(db, f"q{i}", f"a{i}", [i])
+        first = get_history(db, limit=2)
+        assert [h.question for h in first] == ["q4", "q3"]
+        second = get_history(db, limit=2, before_id=first[-1].id)
+        assert [h.question for h in second] == ["q2", "q1"]
+        # offset (legacy) devuelve lo mismo
+        assert [h.id for h in get_history(db, limit=2, offset=2)] == [
+            h.id for h in second
+        ]
+
+
+def test_store_documents_stream_single_transaction(in_memory_sqlite):
+    storage = SqlDocumentStorage()
+    texts = (f"doc {i}" for i in range(7))  # generador: longitud desconocida
+    ids = storage.store_documents_stream(texts, chunk_size=3)
+    assert len(ids) == 7 and ids == sorted(ids)
+    assert [d.content for d in storage.get(ids[-2:])] == ["doc 5", "doc 6"]
+
+
+def test_store_documents_ids_match_rows_after_deletes(in_memory_sqlite):
+    from sqlalchemy import delete
+
+    from src.infrastructure.persistence.sqlalchemy.models import Document as DbDoc
+
+    storage = SqlDocumentStorage()
+    first = storage.store_documents(["a", "b", "c"])
+    with in_memory_sqlite() as db:  # hueco en medio y al final
+        db.execute(delete(DbDoc).where(DbDoc.id.in_([first[1], first[2]])))
+        db.commit()
+    ids = storage.store_documents(["x", "y"])
+    by_id = {d.id: d.content for d in storage.get(ids)}
+    assert [by_id[i] for i in ids] == ["x", "y"]
+
+
+def test_get_history_returns_plain_rows(in_memory_sqlite):
+    from src.infrastructure.persistence.sqlalchemy.crud import add_history, get_history
+
+    with in_memory_sqlite() as db:
+        add_history(db, "q", "a", [3, 1])
+        (row,) = get_history(db, limit=5)
+        assert (row.question, row.answer, row.source_ids) == ("q", "a", [3, 1])
+        assert row.created_at is not None
+        assert not db.identity_map  # sin objetos ORM cargados
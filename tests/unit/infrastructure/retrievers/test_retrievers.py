@@ -31,15 +31,19 @@ class DummyDocRepo:
 class DummyFaissIndex:
     def __init__(self):
         self.id_map = [1, 2]
-        # Para query=[1,0], devuelve idx=0 (Doc A), query=[0,1], idx=1 (Doc B)
+        # search devuelve ids de BD: query=[1,0] -> id 1 (Doc A), [0,1] -> id 2 (Doc B)
 
     def search(self, query_vec, k):
-        if query_vec == [1, 0]:  # closest: idx 0
-            return np.array([0]), np.array([0.0])
-        elif query_vec == [0, 1]:  # closest: idx 1
+        if query_vec == [1, 0]:  # closest: Doc A
             return np.array([1]), np.array([0.0])
+        elif query_vec == [0, 1]:  # closest: Doc B
+            return np.array([2]), np.array([0.0])
         else:
-            return np.array([0]), np.array([999.0])
+            return np.array([1]), np.array([999.0])
+
+    def search_batch(self, query_vecs, k):
+        rows = [self.search(list(q), k) for q in query_vecs]
+        return np.stack([r[0] for r in rows]), np.stack([r[1] for r in rows])
 
 
 def test_dense_faiss_retriever_basic():
@@ -55,6 +59,18 @@ def test_dense_faiss_retriever_basic():
     assert docs and docs[0].content == "Doc B"
 
 
+def test_dense_faiss_retrieve_batch_matches_single_queries():
+    retriever = DenseFaissRetriever(
+        embedder=DummyEmbedder(),
+        faiss_index=DummyFaissIndex(),
+        doc_repo=DummyDocRepo(),
+    )
+    batch = retriever.retrieve_batch(["Doc A", "Doc B", "Doc A"], k=1)
+    assert [docs[0].content for docs, _ in batch] == ["Doc A", "Doc B", "Doc A"]
+    assert batch[1] == retriever.retrieve("Doc B", k=1)
+    assert retriever.retrieve_batch([], k=1) == []
+
+
 def test_sparse_bm25_retriever_basic():
     # Sin tokenización real, pero BM25Okapi exige listas de palabras, así que “hackeamos”:
 
@@ -67,9 +83,9 @@ def test_sparse_bm25_retriever_basic():
             return [1.0, 0.0] if "a" in query else [0.0, 1.0]
 
     class DummySparse(SparseBM25Retriever):
-        def __init__(self, documents, doc_ids, doc_repo):
+        def __init__(self, documents, doc_ids):
             self.doc_ids = doc_ids
-            self.doc_repo = doc_repo
+            self.documents = documents
             self.bm25 = DummyBM25()
             self.corpus_is_empty = False
 
@@ -77,8 +93,7 @@ def test_sparse_bm25_retriever_basic():
         def _tok(text):
             return list(text.lower())
 
-    repo = DummyDocRepo()
-    retriever = DummySparse(documents=["Doc A", "Doc B"], doc_ids=[1, 2], doc_repo=repo)
+    retriever = DummySparse(documents=["Doc A", "Doc B"], doc_ids=[1, 2])
     docs, scores = retriever.retrieve("a", k=1)
     assert len(docs) == 1 and docs[0].content == "Doc A"
     assert scores[0] == 1.0
@@ -105,3 +120,237 @@ def test_hybrid_retriever_merges_and_ranks():
     docs, scores = hybrid.retrieve("irrelevant", k=2)
     assert set(d.content for d in docs) == {"Doc A", "Doc B"}
     assert len(scores) == 2
+
+
+def test_hybrid_retriever_sums_weighted_scores_and_ranks():
+    class FixedRetriever:
+        def __init__(self, docs, scores):
+            self._docs, self._scores = docs, scores
+
+        def retrieve(self, query, k=5):
+            return self._docs, self._scores
+
+    a, b, c = (Document(id=i, content=f"D{i}") for i in (1, 2, 3))
+    dense = FixedRetriever([a, b, c], [0.9, 0.6, 0.3])
+    sparse = FixedRetriever([b, c], [7.5, 3.0])
+    hybrid = HybridRetriever(dense=dense, sparse=sparse, alpha=0.5)
+
+    docs, scores = hybrid.retrieve("q", k=2)
+    # min-max por retriever: dense [1, .5, 0], sparse [1, 0]
+    # b = 0.5*0.5 + 0.5*1.0 = 0.75 ; a = 0.5 ; c = 0
+    assert [d.id for d in docs] == [2, 1]
+    assert scores == pytest.approx([0.75, 0.5])
+    assert hybrid.retrieve("q", k=0) == ([], [])
+
+
+def test_sparse_bm25_query_tokens_are_cached_but_corpus_is_not():
+    SparseBM25Retriever._tok.cache_clear()
+    SparseBM25Retriever(documents=["uno dos", "tres cuatro"], doc_ids=[1, 2])
+    assert SparseBM25Retriever._tok.cache_info().currsize == 0
+
+    assert SparseBM25Retriever._tok("Hola  <b>Mundo</b>") == ("hola", "mundo")
+    SparseBM25Retriever._tok("Hola  <b>Mundo</b>")
+    assert SparseBM25Retriever._tok.cache_info().hits == 1
+
+
+def test_sparse_bm25_returns_top_k_ranked_and_normalized():
+    class FixedBM25:
+        def get_scores(self, query):
+            return np.array([0.5, 3.0, 0.0, 2.0])
+
+    # sin repositorio: el contenido sale del corpus en memoria
+    retriever = SparseBM25Retriever(
+        documents=["D10", "D11", "D12", "D13"], doc_ids=[10, 11, 12, 13]
+    )
+    retriever.bm25, retriever.corpus_is_empty = FixedBM25(), False
+
+    docs, scores = retriever.retrieve("algo", k=3)
+    assert [d.id for d in docs] == [11, 13, 10]
+    assert [d.content for d in docs] == ["D11", "D13", "D10"]
+    assert scores == pytest.approx([1.0, 0.6, 0.0])
+
+
+def test_hybrid_aretrieve_matches_retrieve():
+    import asyncio
+
+    dense = DenseFaissRetriever(
+        embedder=DummyEmbedder(), faiss_index=DummyFaissIndex(), doc_repo=DummyDocRepo()
+    )
+
+    class FixedSparse:
+        def retrieve(self, query, k=5):
+            return [Document(id=2, content="Doc B")], [1.0]
+
+    hybrid = HybridRetriever(dense=dense, sparse=FixedSparse(), alpha=0.5)
+    assert asyncio.run(hybrid.aretrieve("Doc A", k=2)) == hybrid.retrieve("Doc A", k=2)
+
+
+def test_csr_bm25_matches_rank_bm25_scores():
+    rank_bm25 = pytest.importorskip("rank_bm25")
+    from src.infrastructure.retrieval.sparse_bm25 import _CsrBM25
+
+    corpus = [
+        ["el", "gato", "come", "pescado"],
+        ["el", "perro", "come", "carne", "carne"],
+        ["el", "pájaro", "vuela"],
+        [],
+        ["gato", "y", "perro"],
+    ]
+    ref = rank_bm25.BM25Okapi(corpus)
+    csr = _CsrBM25(corpus)
+    for query in (["gato"], ["el", "come"], ["carne", "carne", "perro"], ["nada"]):
+        assert csr.get_scores(query) == pytest.approx(ref.get_scores(query))
+
+
+def test_dense_aretrieve_coalesces_concurrent_queries():
+    import asyncio
+
+    class CountingRetriever(DenseFaissRetriever):
+        def retrieve_batch(self, queries, k=5):
+            self.batches.append(len(queries))
+            return super().retrieve_batch(queries, k)
+
+    retriever = CountingRetriever(
+        embedder=DummyEmbedder(),
+        faiss_index=DummyFaissIndex(),
+        doc_repo=DummyDocRepo(),
+        batch_window_ms=20,
+    )
+    retriever.batches = []
+
+    async def many():
+        return await asyncio.gather(
+            *(retriever.aretrieve(q, k=1) for q in ("Doc A", "Doc B", "Doc A"))
+        )
+
+    results = asyncio.run(many())
+    assert [docs[0].content for docs, _ in results] == ["Doc A", "Doc B", "Doc A"]
+    assert retriever.batches == [3]
+
+
+def test_sparse_bm25_parallel_tokenization_matches_serial(monkeypatch):
+    from src.infrastructure.retrieval import sparse_bm25
+    from src.settings import settings
+
+    docs = [f"Pregunta {i}: <b>Hola</b>  mundo {i % 7}" for i in range(40)]
+    serial = sparse_bm25._tokenize_corpus(sparse_bm25._tokenize, docs)
+    monkeypatch.setattr(settings, "bm25_parallel_min_docs", 10, raising=False)
+    monkeypatch.setattr(sparse_bm25.os, "cpu_count", lambda: 2)
+    assert sparse_bm25._tokenize_corpus(sparse_bm25._tokenize, docs) == serial
+
+
+def test_sparse_bm25_cache_skips_tokenization_on_same_corpus(monkeypatch, tmp_path):
+    from src.infrastructure.retrieval import sparse_bm25
+
+    docs = ["el gato come", "el perro ladra", "ñandú corre"]
+    cache = tmp_path / "bm25.npz"
+    first = SparseBM25Retriever(docs, [1, 2, 3], cache_path=cache)
+    assert cache.exists()
+
+    def boom(*a, **k):
+        raise AssertionError("no debe re-tokenizar")
+
+    monkeypatch.setattr(sparse_bm25, "_tokenize_corpus", boom)
+    second = SparseBM25Retriever(docs, [1, 2, 3], cache_path=cache)
+    assert second.bm25.vocab == first.bm25.vocab
+    for q in ("gato", "el perro", "ñandú"):
+        assert second.retrieve(q, k=3) == first.retrieve(q, k=3)
+
+    # otro corpus: la clave no coincide y se reconstruye
+    with pytest.raises(AssertionError, match="re-tokenizar"):
+        SparseBM25Retriever(docs[:2], [1, 2], cache_path=cache)
+
+
+def test_sparse_bm25_tokenize_matches_preprocess_pipeline():
+    import random
+    import re
+
+    from src.infrastructure.retrieval.sparse_bm25 import _tokenize
+    from src.utils import preprocess_text
+
+    rng = random.Random(0)
+    alphabet = " \t\n <>/aBñ1_\x1c"
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+        assert _tokenize(text) == tuple(re.findall(r"\w+", preprocess_text(text)))
+
+
+def test_hybrid_retrieve_batch_uses_one_dense_batch():
+    class CountingDense(DenseFaissRetriever):
+        def retrieve_batch(self, queries, k=5):
+            self.batches.append(list(queries))
+            return super().retrieve_batch(queries, k)
+
+    dense = CountingDense(
+        embedder=DummyEmbedder(), faiss_index=DummyFaissIndex(), doc_repo=DummyDocRepo()
+    )
+    dense.batches = []
+
+    class FixedSparse:
+        def retrieve(self, query, k=5):
+            return [Document(id=2, content="Doc B")], [1.0]
+
+    hybrid = HybridRetriever(dense=dense, sparse=FixedSparse(), alpha=0.5)
+    queries = ["Doc A", "Doc B", "Doc A"]
+    batch = hybrid.retrieve_batch(queries, k=2)
+    assert dense.batches == [queries]
+    assert batch == [hybrid.retrieve(q, k=2) for q in queries]
+
+
+def test_query_batcher_cancels_worker_on_rebind_and_aclose():
+    import asyncio
+
+    from src.infrastructure.retrieval.batching import QueryBatcher
+
+    batcher = QueryBatcher(lambda qs, k: [([q], [1.0]) for q in qs])
+
+    async def ask(q):
+        return await batcher.submit(q, 1)
+
+    assert asyncio.run(ask("a")) == (["a"], [1.0])
+    first = batcher._worker
+
+    async def rebind_then_close():
+        assert await ask("b") == (["b"], [1.0])
+        worker = batcher._worker
+        assert worker is not first
+        await batcher.aclose()
+        return worker
+
+    worker = asyncio.run(rebind_then_close())
+    assert worker.cancelled() and batcher._worker is None
+
+    # aclose con consultas pendientes: se cancelan, no quedan colgadas
+    async def pending_then_close():
+        task = asyncio.ensure_future(ask("c"))
+        await asyncio.sleep(0)  # encolada, aún sin servir
+        await batcher.aclose()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(pending_then_close())
+
+
+@pytest.mark.parametrize(
+    "payload", [b"not a cache", b"PK\x03\x04truncated", "missing-keys"]
+)
+def test_sparse_bm25_rebuilds_over_a_corrupt_cache(tmp_path, caplog, payload):
+    docs = ["el gato come", "el perro ladra"]
+    cache = tmp_path / "bm25.npz"
+    if payload == "missing-keys":
+        from src.infrastructure.retrieval.sparse_bm25 import _corpus_key
+
+        # zip válido con la clave correcta, pero sin data/indices/...
+        np.savez(cache, key=np.array(_corpus_key(docs)))
+    else:
+        cache.write_bytes(payload)
+
+    with caplog.at_level("WARNING"):
+        retriever = SparseBM25Retriever(docs, [1, 2], cache_path=cache)
+    assert "Ignoring unreadable BM25 cache" in caplog.text
+    assert retriever.retrieve("gato", k=1)[0][0].id == 1
+    # reconstruida y regrabada: la siguiente carga la reutiliza sin avisos
+    caplog.clear()
+    with caplog.at_level("WARNING"):
+        SparseBM25Retriever(docs, [1, 2], cache_path=cache)
+    assert caplog.text == ""
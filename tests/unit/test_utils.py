@@ -1,7 +1,7 @@
 # tests/test_utils.py
 
 from src.core.domain.entities import Document
-from src.utils import get_corpus_and_ids, preprocess_text
+from src.utils import get_corpus_and_ids, preprocess_text, strip_html
 
 
 class DummyRepo:
@@ -22,8 +22,28 @@ def test_preprocess_text():
     assert preprocess_text(raw) == "hello world"
 
 
+def test_strip_html():
+    assert strip_html("<p>Hola <i>RAG</i></p>") == "Hola RAG"
+    assert strip_html("a > b") == "a > b"  # sin "<": texto intacto
+
+
 def test_get_corpus_and_ids():
     repo = DummyRepo()
     corpus, ids = get_corpus_and_ids(repo)
     assert corpus == ["Hello World", "Second Doc"]
     assert ids == [1, 2]
+
+
+def test_preprocess_text_matches_regex_pipeline():
+    import random
+    import re
+
+    def reference(text):
+        text = re.sub(r"\s+", " ", text.lower().strip())
+        return re.sub(r"<[^>]+>", "", text)
+
+    rng = random.Random(0)
+    alphabet = " \t\n\u00a0<>/aBñ\x1c"
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+        assert preprocess_text(text) == reference(text)